@@ -9,6 +9,8 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.models import User
 
+from military_config.db import query_budget
+
 
 class LogoutView(View):
     def get(self, request):
@@ -17,6 +19,7 @@ class LogoutView(View):
 
 
 @login_required(login_url='login')
+@query_budget(5)
 def settings(request):
     """User profile settings"""
     if request.method == 'POST':
@@ -67,10 +70,10 @@ def settings(request):
 
 
 urlpatterns = [
-    path('login/', LoginView.as_view(
+    path('login/', query_budget(3)(LoginView.as_view(
         template_name='accounts/login.html',
         authentication_form=AuthenticationForm
-    ), name='login'),
-    path('logout/', LogoutView.as_view(), name='logout'),
+    )), name='login'),
+    path('logout/', query_budget(5)(LogoutView.as_view()), name='logout'),
     path('settings/', settings, name='settings'),
 ]
@@ -1,21 +1,101 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from assets.models import (
     Base, EquipmentType, Asset, Personnel, Purchase, 
-    Transfer, Assignment, Expenditure, TransactionLog, TransferLog
+    Transfer, Assignment, Expenditure, TransactionLog, TransferLog,
+    StockThreshold, StockAlert
 )
+from assets.reference import base_name, equipment_type_name
+from military_config.db import SAFE_METHODS, ledger_atomic
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that estimates the row count of huge unfiltered tables.
+
+    An exact COUNT(*) over the whole ledger scans every row. When the
+    changelist is unfiltered and the table is larger than
+    ADMIN_ESTIMATED_COUNT_THRESHOLD rows, the planner statistics
+    (PostgreSQL) or the highest primary key (other backends) are used instead.
+    Filtered changelists are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            estimate = self.estimate(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimate(model, using):
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [model._meta.db_table],
+                )
+            else:
+                cursor.execute('SELECT MAX({}) FROM {}'.format(
+                    connection.ops.quote_name(model._meta.pk.column),
+                    connection.ops.quote_name(model._meta.db_table),
+                ))
+            row = cursor.fetchone()
+        if row is None or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+
+class LedgerWritesAdmin(admin.ModelAdmin):
+    """
+    Admin whose saves and deletes may write the transaction log, directly or
+    through the cascade from assets: changes to an audit database commit or
+    roll back with the primary's (see military_config.db.ledger_atomic).
+    """
+
+    def in_ledger_transaction(self, view, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        with ledger_atomic():
+            return view(request, *args, **kwargs)
+
+    def changeform_view(self, request, *args, **kwargs):
+        return self.in_ledger_transaction(super().changeform_view, request, *args, **kwargs)
+
+    def changelist_view(self, request, *args, **kwargs):
+        # Bulk actions, including "delete selected", are POSTed to the changelist
+        return self.in_ledger_transaction(super().changelist_view, request, *args, **kwargs)
+
+    def delete_view(self, request, *args, **kwargs):
+        return self.in_ledger_transaction(super().delete_view, request, *args, **kwargs)
+
+
+class LedgerAdmin(LedgerWritesAdmin):
+    """Changelist settings shared by the large ledger tables"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Base)
-class BaseAdmin(admin.ModelAdmin):
+class BaseAdmin(LedgerWritesAdmin):
     list_display = ('name', 'location', 'commander', 'created_at')
+    list_select_related = ('commander',)
     search_fields = ('name', 'location')
     list_filter = ('created_at',)
     readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(EquipmentType)
-class EquipmentTypeAdmin(admin.ModelAdmin):
+class EquipmentTypeAdmin(LedgerWritesAdmin):
     list_display = ('name', 'category', 'unit_of_measure')
     list_filter = ('category',)
     search_fields = ('name', 'description')
@@ -23,9 +103,9 @@ class EquipmentTypeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Asset)
-class AssetAdmin(admin.ModelAdmin):
+class AssetAdmin(LedgerWritesAdmin):
     list_display = ('get_equipment', 'get_base', 'opening_balance', 'closing_balance', 'assigned_count', 'expended_count')
-    list_filter = ('base', 'equipment_type', 'created_at')
+    list_filter = ('base', 'equipment_type')
     search_fields = ('equipment_type__name', 'base__name')
     readonly_fields = ('created_at', 'updated_at', 'calculate_net_movement')
     fieldsets = (
@@ -45,17 +125,18 @@ class AssetAdmin(admin.ModelAdmin):
     )
     
     def get_equipment(self, obj):
-        return obj.equipment_type.name
+        return equipment_type_name(obj.equipment_type_id)
     get_equipment.short_description = 'Equipment'
     
     def get_base(self, obj):
-        return obj.base.name
+        return base_name(obj.base_id)
     get_base.short_description = 'Base'
 
 
 @admin.register(Personnel)
 class PersonnelAdmin(admin.ModelAdmin):
     list_display = ('get_name', 'rank', 'service_number', 'get_base')
+    list_select_related = ('user',)
     list_filter = ('base', 'rank')
     search_fields = ('user__first_name', 'user__last_name', 'service_number')
     readonly_fields = ('created_at', 'updated_at')
@@ -65,16 +146,19 @@ class PersonnelAdmin(admin.ModelAdmin):
     get_name.short_description = 'Name'
     
     def get_base(self, obj):
-        return obj.base.name
+        return base_name(obj.base_id)
     get_base.short_description = 'Base'
 
 
 @admin.register(Purchase)
-class PurchaseAdmin(admin.ModelAdmin):
+class PurchaseAdmin(LedgerAdmin):
     list_display = ('id', 'get_asset', 'quantity', 'supplier', 'cost', 'status_badge', 'purchase_date')
-    list_filter = ('status', 'purchase_date', 'asset__base')
+    list_select_related = ('asset',)
+    list_filter = ('status', 'asset__base')
+    date_hierarchy = 'purchase_date'
     search_fields = ('reference_number', 'supplier', 'asset__equipment_type__name')
     readonly_fields = ('created_at', 'updated_at', 'purchase_date', 'approval_date')
+    actions = ('approve_selected',)
     fieldsets = (
         ('Purchase Information', {
             'fields': ('asset', 'quantity', 'supplier', 'reference_number', 'cost')
@@ -104,11 +188,18 @@ class PurchaseAdmin(admin.ModelAdmin):
         )
     status_badge.short_description = 'Status'
 
+    @admin.action(description='Approve selected pending purchases')
+    def approve_selected(self, request, queryset):
+        approved = queryset.approve(request.user)
+        self.message_user(request, f'{approved} purchase(s) approved.')
+
 
 @admin.register(Transfer)
-class TransferAdmin(admin.ModelAdmin):
+class TransferAdmin(LedgerAdmin):
     list_display = ('id', 'equipment_type', 'quantity', 'from_base', 'to_base', 'status_badge', 'initiated_date')
-    list_filter = ('status', 'initiated_date')
+    list_select_related = ('equipment_type', 'from_base', 'to_base')
+    list_filter = ('status',)
+    date_hierarchy = 'initiated_date'
     search_fields = ('reference_number', 'equipment_type__name')
     readonly_fields = ('created_at', 'updated_at', 'initiated_date')
     fieldsets = (
@@ -143,9 +234,11 @@ class TransferAdmin(admin.ModelAdmin):
 
 
 @admin.register(Assignment)
-class AssignmentAdmin(admin.ModelAdmin):
+class AssignmentAdmin(LedgerAdmin):
     list_display = ('id', 'get_personnel', 'get_asset', 'quantity', 'assignment_date', 'get_status')
-    list_filter = ('assignment_date', 'asset__base')
+    list_select_related = ('personnel__user', 'asset')
+    list_filter = ('asset__base',)
+    date_hierarchy = 'assignment_date'
     search_fields = ('personnel__user__first_name', 'personnel__user__last_name', 'asset__equipment_type__name')
     readonly_fields = ('created_at', 'updated_at')
     
@@ -165,9 +258,11 @@ class AssignmentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Expenditure)
-class ExpenditureAdmin(admin.ModelAdmin):
+class ExpenditureAdmin(LedgerAdmin):
     list_display = ('id', 'get_asset', 'quantity', 'reason', 'expended_date')
-    list_filter = ('expended_date', 'asset__base')
+    list_select_related = ('asset',)
+    list_filter = ('asset__base',)
+    date_hierarchy = 'expended_date'
     search_fields = ('reference_number', 'reason', 'asset__equipment_type__name')
     readonly_fields = ('created_at', 'updated_at', 'expended_date')
     
@@ -177,12 +272,26 @@ class ExpenditureAdmin(admin.ModelAdmin):
 
 
 @admin.register(TransactionLog)
-class TransactionLogAdmin(admin.ModelAdmin):
+class TransactionLogAdmin(LedgerAdmin):
     list_display = ('id', 'get_asset', 'transaction_type', 'quantity', 'get_user', 'created_at')
-    list_filter = ('transaction_type', 'created_at')
+    list_select_related = False
+    list_filter = ('transaction_type',)
+    date_hierarchy = 'created_at'
     search_fields = ('asset__equipment_type__name', 'created_by__username')
     readonly_fields = ('created_at', 'asset', 'transaction_type', 'quantity', 'created_by', 'ip_address', 'user_agent')
     
+    # The log may sit in the audit database, so related rows are prefetched
+    # and searches resolved to ids instead of joined
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('asset', 'created_by')
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        asset_ids = Asset.objects.filter(equipment_type__name__icontains=search_term).values_list('id', flat=True)
+        user_ids = User.objects.filter(username__icontains=search_term).values_list('id', flat=True)
+        return queryset.filter(Q(asset_id__in=list(asset_ids)) | Q(created_by_id__in=list(user_ids))), False
+    
     def get_asset(self, obj):
         return str(obj.asset)
     get_asset.short_description = 'Asset'
@@ -199,8 +308,43 @@ class TransactionLogAdmin(admin.ModelAdmin):
 
 
 @admin.register(TransferLog)
-class TransferLogAdmin(admin.ModelAdmin):
+class TransferLogAdmin(LedgerAdmin):
     list_display = ('id', 'asset', 'transfer_type', 'quantity', 'status', 'created_at')
-    list_filter = ('transfer_type', 'status', 'created_at')
+    list_select_related = ('asset',)
+    list_filter = ('transfer_type', 'status')
     search_fields = ('asset__equipment_type__name',)
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(StockThreshold)
+class StockThresholdAdmin(admin.ModelAdmin):
+    list_display = ('get_equipment', 'get_base', 'minimum', 'clear_margin', 'updated_at')
+    list_filter = ('base', 'equipment_type')
+    readonly_fields = ('created_at', 'updated_at')
+    
+    def get_equipment(self, obj):
+        return equipment_type_name(obj.equipment_type_id)
+    get_equipment.short_description = 'Equipment'
+    
+    def get_base(self, obj):
+        return base_name(obj.base_id)
+    get_base.short_description = 'Base'
+
+
+@admin.register(StockAlert)
+class StockAlertAdmin(LedgerAdmin):
+    list_display = ('id', 'get_asset', 'status', 'minimum', 'triggered_balance', 'triggered_at', 'cleared_at')
+    list_select_related = ('asset',)
+    list_filter = ('status',)
+    date_hierarchy = 'triggered_at'
+    readonly_fields = (
+        'asset', 'threshold', 'status', 'minimum', 'triggered_balance', 'triggered_at',
+        'cleared_balance', 'cleared_at',
+    )
+    
+    def get_asset(self, obj):
+        return str(obj.asset)
+    get_asset.short_description = 'Asset'
+    
+    def has_add_permission(self, request):
+        return False
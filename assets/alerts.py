@@ -0,0 +1,70 @@
+"""
+Low-stock alerting.
+
+Alerts are evaluated only for the assets whose balance just changed: the
+balance-changing code paths call schedule_evaluation() with the touched
+asset ids and evaluation runs once the transaction commits. Each evaluation
+reads the touched assets, their thresholds and their active alerts (three
+queries whatever the number of assets).
+
+State changes use hysteresis so a balance hovering around the minimum does
+not flap: an alert is raised when the balance drops below the minimum and is
+cleared only when it is back at or above minimum + clear_margin.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+def schedule_evaluation(*asset_ids):
+    """Evaluate the given assets once the current transaction commits"""
+    asset_ids = {asset_id for asset_id in asset_ids if asset_id is not None}
+    if asset_ids:
+        transaction.on_commit(lambda: evaluate_assets(asset_ids))
+
+
+def evaluate_assets(asset_ids):
+    """Raise or clear alerts of the given assets; returns (raised, cleared) counts"""
+    from assets.models import Asset, StockAlert, StockThreshold
+
+    assets = list(Asset.objects.filter(id__in=list(asset_ids)).values_list(
+        'id', 'base_id', 'equipment_type_id', 'closing_balance'
+    ))
+    if not assets:
+        return 0, 0
+
+    pairs = Q()
+    for _, base_id, equipment_type_id, _ in assets:
+        pairs |= Q(base_id=base_id, equipment_type_id=equipment_type_id)
+    thresholds = {
+        (threshold.base_id, threshold.equipment_type_id): threshold
+        for threshold in StockThreshold.objects.filter(pairs)
+    }
+    active = {
+        alert.asset_id: alert
+        for alert in StockAlert.objects.filter(asset_id__in=[row[0] for row in assets], status='ACTIVE')
+    }
+
+    now = timezone.now()
+    raised, cleared = [], []
+    for asset_id, base_id, equipment_type_id, balance in assets:
+        threshold = thresholds.get((base_id, equipment_type_id))
+        alert = active.get(asset_id)
+        if alert is None:
+            if threshold is not None and balance < threshold.minimum:
+                raised.append(StockAlert(
+                    asset_id=asset_id, threshold=threshold, minimum=threshold.minimum,
+                    triggered_balance=balance, triggered_at=now,
+                ))
+        elif threshold is None or balance >= threshold.minimum + threshold.clear_margin:
+            alert.status = 'CLEARED'
+            alert.cleared_balance = balance
+            alert.cleared_at = now
+            cleared.append(alert)
+
+    with transaction.atomic():
+        if raised:
+            StockAlert.objects.bulk_create(raised, ignore_conflicts=True)
+        if cleared:
+            StockAlert.objects.bulk_update(cleared, ['status', 'cleared_balance', 'cleared_at'])
+    return len(raised), len(cleared)
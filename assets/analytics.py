@@ -0,0 +1,104 @@
+"""
+Transfer flow analytics.
+
+The flow matrix sums the volume of COMPLETED transfers per origin base,
+destination base and equipment category over a window of days. It is one
+grouped query over transfers, read through the (status, completion_date,
+from_base, to_base) index; categories come from the reference-data cache so
+no join to equipment types is needed.
+
+A window that ends before today is closed: new completions are always dated
+now, so its matrix only changes when a completed transfer dated in the past
+is edited or deleted. Closed windows are kept in the shared cache under a
+version token that those edits bump, together with the reference-data
+version (an equipment type may change category).
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from assets.reference import get_equipment_type, get_reference_data
+
+VERSION_KEY = 'transfer_flows:version'
+
+
+def flows_version():
+    cache = caches['shared']
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_closed_flows():
+    caches['shared'].set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def local_day(value):
+    """Calendar day of a datetime in the current time zone (naive values are taken as local)"""
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def is_closed(end_date):
+    """Whether a window ending on end_date (inclusive) lies entirely in the past"""
+    return end_date < timezone.localdate()
+
+
+def compute_flow_matrix(start_date, end_date, base_id=None):
+    """Volume of completed transfers per (from base, to base, category) in [start_date, end_date]"""
+    from assets.models import Transfer
+
+    transfers = Transfer.objects.filter(
+        status='COMPLETED',
+        completion_date__gte=start_of_day(start_date),
+        completion_date__lt=start_of_day(end_date + timedelta(days=1)),
+    )
+    if base_id is not None:
+        transfers = transfers.filter(Q(from_base_id=base_id) | Q(to_base_id=base_id))
+
+    rows = transfers.values('from_base_id', 'to_base_id', 'equipment_type_id').annotate(
+        quantity=Sum('quantity'), transfers=Count('id')
+    ).order_by()
+
+    cells = defaultdict(lambda: {'quantity': 0, 'transfers': 0})
+    for row in rows:
+        equipment_type = get_equipment_type(row['equipment_type_id'])
+        category = equipment_type.category if equipment_type else 'OTHER'
+        cell = cells[(row['from_base_id'], row['to_base_id'], category)]
+        cell['quantity'] += float(row['quantity'])
+        cell['transfers'] += row['transfers']
+
+    return [
+        {'from_base_id': from_base_id, 'to_base_id': to_base_id, 'category': category, **totals}
+        for (from_base_id, to_base_id, category), totals in sorted(cells.items())
+    ]
+
+
+def flow_matrix(start_date, end_date, base_id=None):
+    """Flow matrix cells, served from the shared cache for closed windows"""
+    if not is_closed(end_date):
+        return compute_flow_matrix(start_date, end_date, base_id)
+
+    cache = caches['shared']
+    # Keyed on the reference version too: recategorising equipment reshapes the matrix
+    key = 'transfer_flows:{}:{}:{}:{}:{}'.format(
+        flows_version(), get_reference_data().version,
+        start_date.isoformat(), end_date.isoformat(), base_id or 'all',
+    )
+    cells = cache.get(key)
+    from tracking.metrics import record_cache_lookup
+    record_cache_lookup('transfer_flows', cells is not None)
+    if cells is None:
+        cells = compute_flow_matrix(start_date, end_date, base_id)
+        cache.set(key, cells, settings.TRANSFER_FLOWS_CACHE_TIMEOUT)
+    return cells
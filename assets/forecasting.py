@@ -0,0 +1,115 @@
+"""
+Consumption forecasting for expendable stock.
+
+Expenditures of every forecast asset are loaded with one grouped query
+(quantity per asset per day) into a NumPy matrix of shape
+(assets, window days). Burn rates for all assets are then computed at once:
+
+* sma_rate: mean daily consumption over the window
+* ewma_rate: exponentially weighted daily consumption, recent days weighing
+  more (weights alpha * (1 - alpha) ** age, normalised over the window)
+
+days_of_supply is the closing balance divided by the EWMA rate, or None for
+assets with no recent consumption. Results are upserted into
+ConsumptionForecast for the dashboard.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from assets.analytics import start_of_day
+from assets.models import Asset, ConsumptionForecast, Expenditure
+
+DEFAULT_CATEGORIES = ('AMMUNITION', 'OTHER')
+DEFAULT_WINDOW_DAYS = 28
+DEFAULT_ALPHA = 0.2
+
+
+def ewma_weights(window_days, alpha):
+    """Weights of each day in the window, oldest first, summing to 1"""
+    ages = np.arange(window_days - 1, -1, -1, dtype=np.float64)
+    weights = alpha * (1.0 - alpha) ** ages
+    return weights / weights.sum()
+
+
+def compute_burn_rates(usage, balances, alpha=DEFAULT_ALPHA):
+    """
+    Vectorised burn rates.
+
+    usage is an (assets, days) array of daily consumption, oldest day first;
+    balances the current stock of each asset. Returns (sma, ewma, days_of_supply)
+    arrays; days_of_supply is NaN where nothing is being consumed.
+    """
+    sma = usage.mean(axis=1)
+    ewma = usage @ ewma_weights(usage.shape[1], alpha)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_supply = np.where(ewma > 0, np.maximum(balances, 0.0) / ewma, np.nan)
+    return sma, ewma, days_of_supply
+
+
+def load_usage(assets, asset_ids, window_days, today=None):
+    """
+    Daily expended quantity per asset over the window ending yesterday.
+
+    assets is the queryset the sorted asset_ids array was read from; it is
+    used as a subquery so no id list is sent to the database.
+    """
+    today = today or timezone.localdate()
+    first_day = today - timedelta(days=window_days)
+    usage = np.zeros((len(asset_ids), window_days), dtype=np.float64)
+    if not len(asset_ids):
+        return usage
+
+    rows = Expenditure.objects.filter(
+        asset__in=assets.values('id'),
+        expended_date__gte=start_of_day(first_day),
+        expended_date__lt=start_of_day(today),
+    ).annotate(day=TruncDate('expended_date')).values_list('asset_id', 'day').annotate(
+        total=Sum('quantity')
+    ).order_by()
+
+    records = np.array(
+        [(asset_id, (day - first_day).days, total) for asset_id, day, total in rows],
+        dtype=np.float64,
+    )
+    if records.size:
+        positions = np.searchsorted(asset_ids, records[:, 0].astype(np.int64))
+        np.add.at(usage, (positions, records[:, 1].astype(np.int64)), records[:, 2])
+    return usage
+
+
+def forecast_consumption(categories=DEFAULT_CATEGORIES, window_days=DEFAULT_WINDOW_DAYS, alpha=DEFAULT_ALPHA):
+    """Compute and store the forecasts of every asset in the categories; returns the count"""
+    assets = Asset.objects.filter(equipment_type__category__in=list(categories)).order_by('id')
+    columns = list(assets.values_list('id', 'closing_balance'))
+    if not columns:
+        return 0
+
+    asset_ids = np.fromiter((asset_id for asset_id, _ in columns), dtype=np.int64, count=len(columns))
+    balances = np.fromiter((balance for _, balance in columns), dtype=np.float64, count=len(columns))
+    usage = load_usage(assets, asset_ids, window_days)
+    sma, ewma, days_of_supply = compute_burn_rates(usage, balances, alpha)
+
+    now = timezone.now()
+    forecasts = [
+        ConsumptionForecast(
+            asset_id=int(asset_id),
+            window_days=window_days,
+            sma_rate=round(float(sma_rate), 3),
+            ewma_rate=round(float(ewma_rate), 3),
+            days_of_supply=None if np.isnan(days) else round(float(days), 1),
+            computed_at=now,
+        )
+        for asset_id, sma_rate, ewma_rate, days in zip(asset_ids, sma, ewma, days_of_supply)
+    ]
+    ConsumptionForecast.objects.bulk_create(
+        forecasts,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['asset'],
+        update_fields=['window_days', 'sma_rate', 'ewma_rate', 'days_of_supply', 'computed_at'],
+    )
+    return len(forecasts)
@@ -1,9 +1,81 @@
 from django import forms
 from django.contrib.auth.models import User
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+from django.urls import reverse
 from assets.models import (
     Asset, Purchase, Transfer, Assignment, 
     Expenditure, Base, EquipmentType, Personnel
 )
+from assets.reference import get_reference_data
+
+
+class ReferenceChoiceIterator(ModelChoiceIterator):
+    """Choices for Base/EquipmentType fields served from the reference-data cache"""
+
+    def _entries(self):
+        data = get_reference_data()
+        if self.queryset.model is Base:
+            return data.bases.values()
+        return data.equipment_types.values()
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for entry in self._entries():
+            yield (ModelChoiceIteratorValue(entry.id, None), entry.name)
+
+    def __len__(self):
+        return len(self._entries()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self._entries())
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField for bases and equipment types that renders its options
+    without querying the database. Submitted values are still validated
+    with a primary-key lookup.
+    """
+    iterator = ReferenceChoiceIterator
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    Select widget that only renders the currently selected option.
+
+    The remaining options are fetched lazily by the browser from a JSON
+    autocomplete endpoint, so rendering the form never iterates the whole
+    queryset. Validation is unchanged: ModelChoiceField still resolves the
+    submitted value with a single primary-key lookup.
+    """
+
+    def __init__(self, url_name, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete-url'] = reverse(self.url_name)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        all_choices = self.choices
+        try:
+            self.choices = self.selected_choices(all_choices, value)
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = all_choices
+
+    @staticmethod
+    def selected_choices(iterator, value):
+        choices = []
+        if iterator.field.empty_label is not None:
+            choices.append(('', iterator.field.empty_label))
+        selected = [v for v in value if v not in (None, '')]
+        if selected:
+            choices.extend(iterator.choice(obj) for obj in iterator.queryset.filter(pk__in=selected))
+        return choices
 
 
 class PurchaseForm(forms.ModelForm):
@@ -13,7 +85,7 @@ class PurchaseForm(forms.ModelForm):
         model = Purchase
         fields = ['asset', 'quantity', 'supplier', 'reference_number', 'cost', 'notes']
         widgets = {
-            'asset': forms.Select(attrs={
+            'asset': AutocompleteSelect('asset_autocomplete', attrs={
                 'class': 'form-control',
                 'required': True
             }),
@@ -49,6 +121,11 @@ class TransferForm(forms.ModelForm):
     class Meta:
         model = Transfer
         fields = ['equipment_type', 'quantity', 'from_base', 'to_base', 'reference_number', 'notes']
+        field_classes = {
+            'equipment_type': ReferenceChoiceField,
+            'from_base': ReferenceChoiceField,
+            'to_base': ReferenceChoiceField,
+        }
         widgets = {
             'equipment_type': forms.Select(attrs={
                 'class': 'form-control',
@@ -96,11 +173,11 @@ class AssignmentForm(forms.ModelForm):
         model = Assignment
         fields = ['asset', 'personnel', 'quantity', 'notes']
         widgets = {
-            'asset': forms.Select(attrs={
+            'asset': AutocompleteSelect('asset_autocomplete', attrs={
                 'class': 'form-control',
                 'required': True
             }),
-            'personnel': forms.Select(attrs={
+            'personnel': AutocompleteSelect('personnel_autocomplete', attrs={
                 'class': 'form-control',
                 'required': True
             }),
@@ -124,7 +201,7 @@ class ExpenditureForm(forms.ModelForm):
         model = Expenditure
         fields = ['asset', 'quantity', 'reason', 'reference_number', 'notes']
         widgets = {
-            'asset': forms.Select(attrs={
+            'asset': AutocompleteSelect('asset_autocomplete', attrs={
                 'class': 'form-control',
                 'required': True
             }),
@@ -152,14 +229,14 @@ class ExpenditureForm(forms.ModelForm):
 class DashboardFilterForm(forms.Form):
     """Form for dashboard filtering"""
     
-    base = forms.ModelChoiceField(
+    base = ReferenceChoiceField(
         queryset=Base.objects.all(),
         required=False,
         empty_label="All Bases",
         widget=forms.Select(attrs={'class': 'form-control'})
     )
     
-    equipment_type = forms.ModelChoiceField(
+    equipment_type = ReferenceChoiceField(
         queryset=EquipmentType.objects.all(),
         required=False,
         empty_label="All Equipment Types",
@@ -184,9 +261,9 @@ class DashboardFilterForm(forms.Form):
 
 
 class ReturnAssignmentForm(forms.Form):
-    """Form for returning assigned assets"""
+    """Form for returning assigned assets; lists the open assignments of one person"""
     assignment = forms.ModelChoiceField(
-        queryset=Assignment.objects.filter(return_date__isnull=True),
+        queryset=Assignment.objects.none(),
         widget=forms.Select(attrs={'class': 'form-control'}),
         required=True
     )
@@ -199,3 +276,10 @@ class ReturnAssignmentForm(forms.Form):
             'placeholder': 'Return notes'
         })
     )
+
+    def __init__(self, *args, personnel=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if personnel is not None:
+            self.fields['assignment'].queryset = Assignment.objects.filter(
+                personnel=personnel, return_date__isnull=True
+            ).select_related('asset', 'personnel__user')
@@ -0,0 +1,64 @@
+"""
+Ledger notifications and the version tokens used to key cached fragments.
+
+transactions_recorded is sent with the list of TransactionLog rows written,
+whether they were saved one at a time or bulk-inserted, so receivers see
+every ledger write exactly once.
+
+Every change to inventory rows (assets, purchases, transfers, assignments,
+expenditures and their logs) bumps the token of each affected base and of
+the global 'all' scope. Tokens live in the shared cache so a change made by
+one worker invalidates the fragments cached by every other worker. Fragments
+are also keyed on the reference-data version, since they show base and
+equipment type names.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import Signal
+
+from assets.reference import get_reference_data
+
+ALL_BASES = 'all'
+
+# Sent after TransactionLog rows are written; kwargs: logs (list of instances)
+transactions_recorded = Signal()
+
+
+def _key(scope):
+    return f'ledger_version:{scope}'
+
+
+def ledger_version(scope):
+    """Current token for a scope ('all' or a base id)"""
+    cache = caches['shared']
+    version = cache.get(_key(scope))
+    if version is None:
+        cache.add(_key(scope), uuid.uuid4().hex, None)
+        version = cache.get(_key(scope))
+    return version
+
+
+def bump_ledger_version(*base_ids):
+    """Invalidate cached fragments of the given bases and of the global scope"""
+    scopes = {ALL_BASES, *(base_id for base_id in base_ids if base_id is not None)}
+    caches['shared'].set_many({_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+
+def ledger_scope(user, user_base):
+    """Scope whose ledger a user sees: every base, their own base or nothing"""
+    if user.is_superuser or user.groups.filter(name='Logistics Officer').exists():
+        return ALL_BASES
+    return user_base.id if user_base else 'none'
+
+
+def ledger_cache_context(user, user_base):
+    """Template context used to key {% cache %} fragments of ledger tables"""
+    scope = ledger_scope(user, user_base)
+    return {
+        'ledger_scope': scope,
+        'ledger_version': ledger_version(scope),
+        'reference_version': get_reference_data().version,
+        'ledger_fragment_timeout': settings.LEDGER_FRAGMENT_TIMEOUT,
+    }
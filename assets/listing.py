@@ -0,0 +1,148 @@
+"""
+Projection-only row objects for the list pages.
+
+The purchases, transfers, assignments and expenditures tables display a
+handful of columns per row. Instead of building full model instances (with
+every text column, such as notes) the list views select only the displayed
+columns with values_list() and wrap each tuple in a small __slots__ object
+whose display strings are computed once. Equipment and base names come from
+the reference-data cache, so no join to those tables is needed.
+"""
+from assets.models import Assignment, Expenditure, Purchase, Transfer
+from assets.reference import base_name, equipment_type_name
+
+
+class RowSet:
+    """
+    Lazily evaluated sequence of rows.
+
+    The query runs on first iteration only, so a page whose table comes from
+    the fragment cache never touches the database for it.
+    """
+
+    def __init__(self, queryset, row_class):
+        self.queryset = queryset
+        self.row_class = row_class
+        self._rows = None
+
+    def __iter__(self):
+        if self._rows is None:
+            build = self.row_class.from_values
+            self._rows = [build(*values) for values in self.queryset.values_list(*self.row_class.fields)]
+        return iter(self._rows)
+
+
+class PurchaseRow:
+    __slots__ = (
+        'id', 'reference_number', 'equipment_name', 'quantity', 'supplier',
+        'cost', 'status', 'status_display', 'purchase_date',
+    )
+    fields = (
+        'id', 'reference_number', 'asset__equipment_type_id', 'quantity', 'supplier',
+        'cost', 'status', 'purchase_date',
+    )
+    status_labels = dict(Purchase.STATUS_CHOICES)
+
+    @classmethod
+    def from_values(cls, pk, reference_number, equipment_type_id, quantity, supplier, cost, status, purchase_date):
+        row = cls()
+        row.id = pk
+        row.reference_number = reference_number
+        row.equipment_name = equipment_type_name(equipment_type_id)
+        row.quantity = quantity
+        row.supplier = supplier
+        row.cost = cost
+        row.status = status
+        row.status_display = cls.status_labels.get(status, status)
+        row.purchase_date = purchase_date
+        return row
+
+
+class TransferRow:
+    __slots__ = (
+        'id', 'reference_number', 'equipment_name', 'quantity', 'from_base_name',
+        'to_base_name', 'status', 'status_display', 'initiated_date',
+    )
+    fields = (
+        'id', 'reference_number', 'equipment_type_id', 'quantity', 'from_base_id',
+        'to_base_id', 'status', 'initiated_date',
+    )
+    status_labels = dict(Transfer.STATUS_CHOICES)
+
+    @classmethod
+    def from_values(cls, pk, reference_number, equipment_type_id, quantity, from_base_id, to_base_id, status, initiated_date):
+        row = cls()
+        row.id = pk
+        row.reference_number = reference_number
+        row.equipment_name = equipment_type_name(equipment_type_id)
+        row.quantity = quantity
+        row.from_base_name = base_name(from_base_id)
+        row.to_base_name = base_name(to_base_id)
+        row.status = status
+        row.status_display = cls.status_labels.get(status, status)
+        row.initiated_date = initiated_date
+        return row
+
+
+class AssignmentRow:
+    __slots__ = (
+        'id', 'personnel_id', 'personnel_name', 'rank', 'equipment_name', 'quantity',
+        'assignment_date', 'return_date',
+    )
+    fields = (
+        'id', 'personnel_id', 'personnel__user__first_name', 'personnel__user__last_name', 'personnel__rank',
+        'asset__equipment_type_id', 'quantity', 'assignment_date', 'return_date',
+    )
+
+    @classmethod
+    def from_values(cls, pk, personnel_id, first_name, last_name, rank, equipment_type_id, quantity,
+                    assignment_date, return_date):
+        row = cls()
+        row.id = pk
+        row.personnel_id = personnel_id
+        row.personnel_name = f'{first_name} {last_name}'.strip()
+        row.rank = rank
+        row.equipment_name = equipment_type_name(equipment_type_id)
+        row.quantity = quantity
+        row.assignment_date = assignment_date
+        row.return_date = return_date
+        return row
+
+
+class ExpenditureRow:
+    __slots__ = (
+        'id', 'reference_number', 'equipment_name', 'quantity', 'reason',
+        'expended_date', 'recorded_by',
+    )
+    fields = (
+        'id', 'reference_number', 'asset__equipment_type_id', 'quantity', 'reason',
+        'expended_date', 'recorded_by__username',
+    )
+
+    @classmethod
+    def from_values(cls, pk, reference_number, equipment_type_id, quantity, reason, expended_date, recorded_by):
+        row = cls()
+        row.id = pk
+        row.reference_number = reference_number
+        row.equipment_name = equipment_type_name(equipment_type_id)
+        row.quantity = quantity
+        row.reason = reason
+        row.expended_date = expended_date
+        row.recorded_by = recorded_by or ''
+        return row
+
+
+def purchase_rows(queryset):
+    return RowSet(queryset, PurchaseRow)
+
+
+def transfer_rows(queryset):
+    return RowSet(queryset, TransferRow)
+
+
+def assignment_rows(queryset):
+    return RowSet(queryset, AssignmentRow)
+
+
+def expenditure_rows(queryset):
+    return RowSet(queryset, ExpenditureRow)
@@ -0,0 +1,334 @@
+"""
+Load generator for a running server.
+
+Virtual users each hold a signed-in session for the three demo roles created
+by `setup_initial_data` (admin, commander, logistics) and loop over weighted
+scenarios until the deadline: dashboard and ledger reads, purchase creation
+and approval, the transfer lifecycle, assignments and expenditures. Every
+HTTP request is timed and counted under its endpoint name.
+
+Only the standard library is used: one keep-alive http.client connection per
+session, cookies and the CSRF token handled by hand. Ids of the records a
+scenario just created are looked up through the ORM, so the command must run
+with the same database settings as the server under test.
+"""
+import http.client
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from assets.models import Asset, Assignment, Base, EquipmentType, Personnel, Purchase, Transfer
+
+ROLES = {
+    'admin': 'admin123',
+    'commander': 'pass123',
+    'logistics': 'pass123',
+}
+PERSONNEL = 5
+PREFIX = 'LOAD'
+
+# Scenario name -> relative weight
+DEFAULT_MIX = {
+    'dashboard': 40,
+    'browse': 20,
+    'purchase': 12,
+    'transfer': 10,
+    'assignment': 10,
+    'expenditure': 8,
+}
+
+
+def parse_mix(value):
+    """'dashboard=50,purchase=10' -> {'dashboard': 50, 'purchase': 10}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+        if mix[name] < 0:
+            raise ValueError(f'Negative weight for {name!r}')
+    if not any(mix.values()):
+        raise ValueError('The traffic mix has no positive weight')
+    return mix
+
+
+def prepare_fixtures():
+    """Assets for every base and equipment type, and personnel at the commander's base"""
+    created = 0
+    for base in Base.objects.all():
+        for equipment_type in EquipmentType.objects.all():
+            _, new = Asset.objects.get_or_create(
+                base=base, equipment_type=equipment_type,
+                defaults={'opening_balance': 100000, 'closing_balance': 100000},
+            )
+            created += new
+
+    command_base = Base.objects.filter(commander__username='commander').first()
+    if command_base is None:
+        raise LookupError("No base is commanded by 'commander'; run setup_initial_data first")
+    for n in range(PERSONNEL):
+        user, _ = User.objects.get_or_create(
+            username=f'loadtest-soldier-{n}', defaults={'first_name': 'Load', 'last_name': f'Test {n}'}
+        )
+        _, new = Personnel.objects.get_or_create(
+            user=user, defaults={'base': command_base, 'rank': 'PVT', 'service_number': f'{PREFIX}-SN-{n}'}
+        )
+        created += new
+
+    return {
+        'assets': list(Asset.objects.values_list('id', 'base_id', 'equipment_type_id')),
+        'command_base': command_base.id,
+        'personnel': list(Personnel.objects.filter(base=command_base).values_list('id', flat=True)),
+        'created': created,
+    }
+
+
+class RequestFailed(Exception):
+    pass
+
+
+class Session:
+    """A signed-in user on one keep-alive connection; requests are timed into `stats` unless it is None"""
+
+    def __init__(self, url, stats):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.stats = stats
+        self.cookies = SimpleCookie()
+        self.connection = None
+
+    def request(self, endpoint, method, path, data=None, expect=(200,), headers=None):
+        body = urlencode(data, doseq=True) if data is not None else None
+        headers = {**(headers or {}), 'Host': f'{self.host}:{self.port}', 'Cookie': self.cookie_header()}
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if method == 'POST':
+            headers['X-CSRFToken'] = self.cookies['csrftoken'].value if 'csrftoken' in self.cookies else ''
+            headers['Referer'] = f'http://{self.host}:{self.port}{path}'
+
+        start = time.perf_counter()
+        try:
+            status, payload = self.send(method, path, body, headers)
+        except (OSError, http.client.HTTPException) as exc:
+            self.record(endpoint, time.perf_counter() - start, type(exc).__name__)
+            raise RequestFailed(f'{method} {path}: {exc}') from exc
+        self.record(endpoint, time.perf_counter() - start, None if status in expect else status)
+        if status not in expect:
+            raise RequestFailed(f'{method} {path}: HTTP {status}')
+        return payload
+
+    def record(self, endpoint, elapsed, error):
+        if self.stats is not None:
+            self.stats.record(endpoint, elapsed, error)
+
+    def send(self, method, path, body, headers):
+        # Reconnect once if the server closed an idle keep-alive connection
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                payload = response.read()
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                self.close()
+                if attempt == 2:
+                    raise
+                continue
+            for header in response.headers.get_all('Set-Cookie') or ():
+                self.cookies.load(header)
+            if response.will_close:
+                self.close()
+            return response.status, payload
+
+    def cookie_header(self):
+        return '; '.join(f'{name}={morsel.value}' for name, morsel in self.cookies.items())
+
+    def login(self, username, password):
+        path = reverse('login')
+        self.request('GET login', 'GET', path)
+        self.request('POST login', 'POST', path, {
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': self.cookies['csrftoken'].value,
+        }, expect=(302,))
+        if 'sessionid' not in self.cookies:
+            raise RequestFailed(f'Login as {username!r} was rejected')
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Stats:
+    """Latencies and failures per endpoint, shared by every virtual user"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, elapsed, error):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if error is not None:
+                self.errors[endpoint][str(error)] += 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            latencies = sorted(self.latencies[endpoint])
+            errors = sum(self.errors[endpoint].values())
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'throughput': len(latencies) / elapsed,
+                'p50_ms': percentile(latencies, 50),
+                'p95_ms': percentile(latencies, 95),
+                'p99_ms': percentile(latencies, 99),
+                'max_ms': latencies[-1] * 1000,
+                'errors': errors,
+                'error_rate': errors / len(latencies),
+                'error_kinds': dict(self.errors[endpoint]),
+            }
+        requests = sum(row['requests'] for row in endpoints.values())
+        errors = sum(row['errors'] for row in endpoints.values())
+        everything = sorted(latency for latencies in self.latencies.values() for latency in latencies)
+        return {
+            'requests': requests,
+            'throughput': requests / elapsed,
+            'p50_ms': percentile(everything, 50),
+            'p95_ms': percentile(everything, 95),
+            'p99_ms': percentile(everything, 99),
+            'errors': errors,
+            'error_rate': errors / requests if requests else 0,
+            'endpoints': endpoints,
+        }
+
+
+def percentile(latencies, pct):
+    """Nearest-rank percentile of sorted latencies in seconds, as milliseconds"""
+    if not latencies:
+        return 0
+    rank = max(1, -(-len(latencies) * pct // 100))
+    return latencies[int(rank) - 1] * 1000
+
+
+class VirtualUser(threading.Thread):
+    """Runs weighted scenarios with one session per demo role until the deadline"""
+
+    def __init__(self, index, url, mix, fixtures, stats, ready, seed):
+        super().__init__(name=f'loadtest-{index}', daemon=True)
+        self.url = url
+        self.scenarios = [getattr(self, f'scenario_{name}') for name in mix]
+        self.weights = list(mix.values())
+        self.fixtures = fixtures
+        self.stats = stats
+        self.ready = ready
+        self.deadline = None
+        self.random = random.Random(seed)
+        self.sessions = {}
+        self.failures = []
+
+    def run(self):
+        # Sign in before the clock starts: password hashing is not part of the mix
+        try:
+            for username, password in ROLES.items():
+                session = Session(self.url, None)
+                session.login(username, password)
+                session.stats = self.stats
+                self.sessions[username] = session
+        except RequestFailed as exc:
+            self.failures.append(str(exc))
+        self.ready.wait()
+        if len(self.sessions) < len(ROLES):
+            return
+
+        while time.monotonic() < self.deadline:
+            scenario = self.random.choices(self.scenarios, self.weights)[0]
+            try:
+                scenario()
+            except RequestFailed as exc:
+                # Counted by the session; keep only a sample of messages
+                if len(self.failures) < 5:
+                    self.failures.append(str(exc))
+        for session in self.sessions.values():
+            session.close()
+
+    def reference(self, kind):
+        return f'{PREFIX}-{kind}-{uuid.uuid4().hex[:12]}'
+
+    def pick_asset(self, base_id=None):
+        assets = self.fixtures['assets']
+        if base_id is not None:
+            assets = [asset for asset in assets if asset[1] == base_id]
+        return self.random.choice(assets)
+
+    def scenario_dashboard(self):
+        session = self.sessions[self.random.choice(list(ROLES))]
+        session.request('GET dashboard', 'GET', reverse('dashboard'))
+
+    def scenario_browse(self):
+        session = self.sessions[self.random.choice(list(ROLES))]
+        page = self.random.choice(['purchases', 'transfers', 'assignments', 'expenditures', 'transaction_log'])
+        session.request(f'GET {page}', 'GET', reverse(page))
+
+    def scenario_purchase(self):
+        """Logistics records a purchase, the admin approves it"""
+        reference_number = self.reference('PO')
+        asset_id = self.pick_asset()[0]
+        self.sessions['logistics'].request('POST purchases', 'POST', reverse('purchases'), {
+            'asset': asset_id, 'quantity': self.random.randint(1, 20), 'supplier': 'Load Test Supplies',
+            'reference_number': reference_number, 'cost': '100.00', 'notes': '',
+        }, expect=(302,))
+        purchase_id = Purchase.objects.filter(reference_number=reference_number).values_list('id', flat=True).get()
+        self.sessions['admin'].request(
+            'POST approve_purchase', 'POST', reverse('approve_purchase', args=[purchase_id])
+        )
+
+    def scenario_transfer(self):
+        """Logistics requests a transfer, the admin dispatches then completes it"""
+        _, from_base, equipment_type = self.pick_asset()
+        to_base = self.random.choice([
+            asset[1] for asset in self.fixtures['assets'] if asset[2] == equipment_type and asset[1] != from_base
+        ])
+        reference_number = self.reference('TR')
+        self.sessions['logistics'].request('POST transfers', 'POST', reverse('transfers'), {
+            'equipment_type': equipment_type, 'quantity': self.random.randint(1, 5),
+            'from_base': from_base, 'to_base': to_base, 'reference_number': reference_number, 'notes': '',
+        }, expect=(302,))
+        transfer_id = Transfer.objects.filter(reference_number=reference_number).values_list('id', flat=True).get()
+        admin = self.sessions['admin']
+        admin.request('POST approve_transfer', 'POST', reverse('approve_transfer', args=[transfer_id]))
+        admin.request('POST complete_transfer', 'POST', reverse('complete_transfer', args=[transfer_id]))
+
+    def scenario_assignment(self):
+        """The commander assigns equipment at their base and sometimes takes it back"""
+        commander = self.sessions['commander']
+        asset_id = self.pick_asset(self.fixtures['command_base'])[0]
+        personnel_id = self.random.choice(self.fixtures['personnel'])
+        notes = self.reference('AS')
+        commander.request('POST assignments', 'POST', reverse('assignments'), {
+            'asset': asset_id, 'personnel': personnel_id, 'quantity': 1, 'notes': notes,
+        }, expect=(302,))
+        if self.random.random() < 0.5:
+            assignment_id = Assignment.objects.filter(notes=notes).values_list('id', flat=True).get()
+            commander.request(
+                'POST return_assignment', 'POST', reverse('return_assignment', args=[assignment_id])
+            )
+
+    def scenario_expenditure(self):
+        """The commander records consumption at their base"""
+        self.sessions['commander'].request('POST expenditures', 'POST', reverse('expenditures'), {
+            'asset': self.pick_asset(self.fixtures['command_base'])[0], 'quantity': 1,
+            'reason': 'Training', 'reference_number': self.reference('EX'), 'notes': '',
+        }, expect=(302,))
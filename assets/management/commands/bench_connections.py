@@ -0,0 +1,72 @@
+import copy
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+ALIAS = 'bench_connections'
+
+
+def strategies(base):
+    """Connection settings compared, derived from a configured database"""
+    per_request = {**copy.deepcopy(base), 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+    per_request['OPTIONS'].pop('pool', None)
+    yield 'per-request', per_request
+    yield 'persistent', {**per_request, 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}
+    if base['ENGINE'] == 'django.db.backends.postgresql':
+        pooled = copy.deepcopy(per_request)
+        pooled['OPTIONS']['pool'] = base['OPTIONS'].get('pool') or {'min_size': 2, 'max_size': 4}
+        yield 'pool', pooled
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request connection overhead with and without persistent connections or a pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to benchmark')
+        parser.add_argument('--requests', type=int, default=500, help='Simulated requests per strategy')
+
+    def handle(self, *args, **options):
+        if options['database'] not in connections:
+            raise CommandError(f"Unknown database alias {options['database']!r}")
+        base = connections[options['database']].settings_dict
+        self.stdout.write(f"{options['requests']} requests against {base['ENGINE'].rsplit('.', 1)[-1]} "
+                          f"({options['database']}), one query each")
+
+        baseline = None
+        for name, settings_dict in strategies(base):
+            try:
+                elapsed = self.run(settings_dict, options['requests'])
+            except Exception as exc:
+                self.stdout.write(f'  {name:<12} skipped: {exc}')
+                continue
+            per_request = elapsed / options['requests'] * 1000
+            baseline = baseline or per_request
+            self.stdout.write(f'  {name:<12} {per_request:8.3f} ms/request  ({baseline / per_request:5.1f}x)')
+
+    def run(self, settings_dict, requests):
+        connections.settings[ALIAS] = settings_dict
+        connection = connections[ALIAS]
+        try:
+            # Warm up so the pool (or persistent connection) exists before timing
+            self.request(connection)
+            start = time.perf_counter()
+            for _ in range(requests):
+                self.request(connection)
+            return time.perf_counter() - start
+        finally:
+            connection.close()
+            if settings_dict['OPTIONS'].get('pool'):
+                connection.close_pool()
+            del connections[ALIAS]
+            del connections.settings[ALIAS]
+
+    @staticmethod
+    def request(connection):
+        """One request cycle: Django's request signals open, reuse or release the connection"""
+        request_started.send(sender=Command)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        request_finished.send(sender=Command)
@@ -0,0 +1,49 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from assets.forecasting import DEFAULT_ALPHA, DEFAULT_WINDOW_DAYS, compute_burn_rates
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorised burn-rate computation against a per-asset Python loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=100000, help='Number of synthetic assets')
+        parser.add_argument('--window', type=int, default=DEFAULT_WINDOW_DAYS, help='Days per series')
+        parser.add_argument('--events', type=int, default=5, help='Expenditure days per asset')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_assets, window = options['assets'], options['window']
+        n_events = n_assets * options['events']
+
+        # Grouped (asset, day, quantity) rows as they come back from the database
+        rows = rng.integers(0, n_assets, n_events)
+        days = rng.integers(0, window, n_events)
+        quantities = rng.integers(1, 500, n_events).astype(np.float64)
+        balances = rng.integers(0, 20000, n_assets).astype(np.float64)
+
+        start = time.perf_counter()
+        usage = np.zeros((n_assets, window))
+        np.add.at(usage, (rows, days), quantities)
+        sma, ewma, days_of_supply = compute_burn_rates(usage, balances, DEFAULT_ALPHA)
+        vectorised = time.perf_counter() - start
+
+        start = time.perf_counter()
+        series = [[0.0] * window for _ in range(n_assets)]
+        for row, day, quantity in zip(rows.tolist(), days.tolist(), quantities.tolist()):
+            series[row][day] += quantity
+        weights = [DEFAULT_ALPHA * (1 - DEFAULT_ALPHA) ** (window - 1 - day) for day in range(window)]
+        total_weight = sum(weights)
+        loop_ewma = []
+        for values in series:
+            loop_ewma.append(sum(w * v for w, v in zip(weights, values)) / total_weight)
+        looped = time.perf_counter() - start
+
+        assert np.allclose(ewma, loop_ewma)
+        self.stdout.write(f'{n_assets} assets x {window} days, {n_events} expenditure days')
+        self.stdout.write(f'  numpy:       {vectorised * 1000:10.1f} ms')
+        self.stdout.write(f'  python loop: {looped * 1000:10.1f} ms ({looped / vectorised:.0f}x slower)')
@@ -0,0 +1,122 @@
+import http.client
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Appended to the configuration under test: every worker records when it is
+# ready to accept requests
+MARKER_HOOK = '''
+import os as _os, time as _time
+
+_ready_hook = globals().get('post_worker_init')
+
+
+def post_worker_init(worker):
+    if _ready_hook:
+        _ready_hook(worker)
+    with open(_os.path.join({markers!r}, str(_os.getpid())), 'w') as handle:
+        handle.write(repr(_time.time()))
+'''
+
+# 'default' is the old Procfile: sync workers importing the app each, no preload
+PROFILES = {
+    'default': '',
+    'shipped': None,  # gunicorn.conf.py
+}
+
+
+def memory(pid):
+    """(rss, pss, uss) of a process in MB, from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as handle:
+        for line in handle:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[name] = int(rest.split()[0]) / 1024
+    return values['Rss'], values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as handle:
+        return [int(child) for child in handle.read().split()]
+
+
+class Command(BaseCommand):
+    help = 'Measure gunicorn start-up time and memory per worker, old defaults against gunicorn.conf.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help='Requests served before memory is read')
+        parser.add_argument('--profile', choices=[*PROFILES, 'both'], default='both')
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('Memory is read from /proc/<pid>/smaps_rollup, which needs Linux 4.14 or later')
+        profiles = list(PROFILES) if options['profile'] == 'both' else [options['profile']]
+        self.stdout.write(f"{options['workers']} workers, memory read after {options['requests']} requests")
+        for profile in profiles:
+            self.report(profile, self.run(profile, options['workers'], options['requests']))
+
+    def run(self, profile, workers, requests):
+        directory = tempfile.mkdtemp()
+        markers = os.path.join(directory, 'ready')
+        os.mkdir(markers)
+        config = PROFILES[profile]
+        if config is None:
+            with open(settings.BASE_DIR / 'gunicorn.conf.py') as handle:
+                config = handle.read()
+        config_path = os.path.join(directory, 'gunicorn.conf.py')
+        with open(config_path, 'w') as handle:
+            handle.write(config + MARKER_HOOK.format(markers=markers))
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        command = [
+            sys.executable, '-m', 'gunicorn', '--config', config_path, '--workers', str(workers),
+            '--bind', f'127.0.0.1:{port}', '--max-requests', '0', '--log-level', 'warning',
+            'military_config.wsgi:application',
+        ]
+        start = time.time()
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env={**os.environ, 'WEB_CONCURRENCY': str(workers)})
+        try:
+            while len(os.listdir(markers)) < workers:
+                if process.poll() is not None:
+                    raise CommandError(f'gunicorn exited with status {process.returncode}')
+                if time.time() - start > 120:
+                    raise CommandError('Workers were not ready after 120 s')
+                time.sleep(0.02)
+            ready = []
+            for name in os.listdir(markers):
+                with open(os.path.join(markers, name)) as handle:
+                    ready.append(float(handle.read()))
+            startup = max(ready) - start
+
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            for _ in range(requests):
+                connection.request('GET', '/accounts/login/', headers={'Host': 'localhost', 'Connection': 'close'})
+                connection.getresponse().read()
+                connection.close()
+            return startup, memory(process.pid), [memory(pid) for pid in children(process.pid)]
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+            shutil.rmtree(directory)
+
+    def report(self, profile, result):
+        startup, master, workers = result
+        average = [sum(worker[i] for worker in workers) / len(workers) for i in range(3)]
+        total_pss = master[1] + sum(worker[1] for worker in workers)
+        self.stdout.write(
+            f'  {profile:<8} start-up {startup:5.2f} s   per worker: RSS {average[0]:6.1f} MB  '
+            f'PSS {average[1]:6.1f} MB  private {average[2]:6.1f} MB   master RSS {master[0]:6.1f} MB   '
+            f'total PSS {total_pss:6.1f} MB'
+        )
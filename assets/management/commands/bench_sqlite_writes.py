@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from military_config.db import is_lock_error, retry_on_lock
+
+ALIAS = 'bench_sqlite'
+ASSETS = 50
+
+# 'stock' is Django's SQLite default: rollback journal, deferred transactions,
+# a connection per request. 'production' is SQLITE_PRODUCTION_PROFILE.
+PROFILES = {
+    'stock': {},
+    'production': settings.SQLITE_PRODUCTION_PROFILE,
+}
+
+
+def database_settings(path, profile):
+    config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, **PROFILES[profile]}
+    return connections.configure_settings({'default': config})['default']
+
+
+def record_movement(connection, worker, n):
+    """The shape of a ledger write view: read a balance, update it, append a log row"""
+    asset_id = (worker * 7919 + n) % ASSETS + 1
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT closing_balance FROM bench_assets WHERE id = %s', [asset_id])
+        balance = cursor.fetchone()[0]
+        cursor.execute('UPDATE bench_assets SET closing_balance = %s WHERE id = %s', [balance + 1, asset_id])
+        cursor.execute(
+            'INSERT INTO bench_logs (asset_id, quantity, created_at) VALUES (%s, %s, %s)',
+            [asset_id, 1, time.time()],
+        )
+
+
+def worker(index, path, profile, seconds, results):
+    """One gunicorn-style worker process writing for `seconds`"""
+    connections.settings[ALIAS] = database_settings(path, profile)
+    connection = connections[ALIAS]
+    persistent = connection.settings_dict['CONN_MAX_AGE'] != 0
+
+    committed = retries = failed = 0
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            _, attempt = retry_on_lock(lambda: record_movement(connection, index, committed), 'bench', using=ALIAS)
+            committed += 1
+            retries += attempt
+            latencies.append(time.perf_counter() - start)
+        except OperationalError as exc:
+            if not is_lock_error(exc):
+                raise
+            failed += 1
+        if not persistent:
+            connection.close()
+    connection.close()
+    results.put((committed, retries, failed, latencies))
+
+
+class Command(BaseCommand):
+    help = 'Measure sustained SQLite write throughput with several concurrent worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent writer processes')
+        parser.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+        parser.add_argument('--profile', choices=[*PROFILES, 'both'], default='both')
+
+    def handle(self, *args, **options):
+        profiles = list(PROFILES) if options['profile'] == 'both' else [options['profile']]
+        self.stdout.write(f"{options['workers']} workers x {options['seconds']:g}s, read-update-insert transactions")
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.prepare(path, profile)
+                self.report(profile, self.run(path, profile, options['workers'], options['seconds']), options['seconds'])
+
+    def prepare(self, path, profile):
+        connections.settings[ALIAS] = database_settings(path, profile)
+        connection = connections[ALIAS]
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE bench_assets (id INTEGER PRIMARY KEY, closing_balance INTEGER NOT NULL)')
+            cursor.execute(
+                'CREATE TABLE bench_logs (id INTEGER PRIMARY KEY, asset_id INTEGER NOT NULL, '
+                'quantity INTEGER NOT NULL, created_at REAL NOT NULL)'
+            )
+            cursor.executemany('INSERT INTO bench_assets (id, closing_balance) VALUES (%s, 0)',
+                               [(n,) for n in range(1, ASSETS + 1)])
+        connection.close()
+        del connections[ALIAS]
+
+    def run(self, path, profile, workers, seconds):
+        # Workers open their own connections, like forked gunicorn workers
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(index, path, profile, seconds, results))
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return collected
+
+    def report(self, profile, collected, seconds):
+        committed = sum(result[0] for result in collected)
+        retries = sum(result[1] for result in collected)
+        failed = sum(result[2] for result in collected)
+        latencies = sorted(latency for result in collected for latency in result[3])
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        self.stdout.write(
+            f'  {profile:<11} {committed / seconds:8.0f} commits/s  p50 {p50:6.2f} ms  p99 {p99:7.2f} ms  '
+            f'{retries} retries  {failed} failed'
+        )
@@ -0,0 +1,116 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from assets.forms import DashboardFilterForm, PurchaseForm, TransferForm
+from assets.ledger import ALL_BASES
+from assets.listing import PurchaseRow, TransferRow
+from assets.models import Asset, Base, EquipmentType
+
+
+class Command(BaseCommand):
+    help = 'Benchmark render time of the hot list templates, cold and with fragment caching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000],
+                            help='Row counts to render (default: 1000 10000)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Renders per measurement; the best time is reported')
+
+    def handle(self, *args, **options):
+        base_ids = list(Base.objects.values_list('id', flat=True)) or [1]
+        equipment_type_ids = list(EquipmentType.objects.values_list('id', flat=True)) or [1]
+        user = User(id=0, username='benchmark', is_superuser=True, is_staff=True)
+
+        benchmarks = [
+            ('assets/dashboard.html', '/', self.dashboard_context),
+            ('assets/purchases.html', '/purchases/', self.purchases_context),
+            ('assets/transfers.html', '/transfers/', self.transfers_context),
+        ]
+
+        self.stdout.write(f"{'template':<28}{'rows':>8}{'cold ms':>12}{'cached ms':>12}")
+        for template, path, build_context in benchmarks:
+            for size in options['sizes']:
+                request = RequestFactory().get(path)
+                request.user = user
+                context = build_context(size, base_ids, equipment_type_ids)
+                context['ledger_scope'] = ALL_BASES
+                context['ledger_fragment_timeout'] = 600
+
+                cold = self.best_of(options['repeat'], lambda: self.render(template, context, request, uuid.uuid4().hex))
+                version = uuid.uuid4().hex
+                self.render(template, context, request, version)
+                cached = self.best_of(options['repeat'], lambda: self.render(template, context, request, version))
+
+                self.stdout.write(f"{template:<28}{size:>8}{cold * 1000:>12.1f}{cached * 1000:>12.1f}")
+
+    @staticmethod
+    def render(template, context, request, version):
+        context['ledger_version'] = version
+        return render_to_string(template, context, request)
+
+    @staticmethod
+    def best_of(repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    @staticmethod
+    def make_asset(i, base_ids, equipment_type_ids):
+        asset = Asset(
+            id=i,
+            base_id=base_ids[i % len(base_ids)],
+            equipment_type_id=equipment_type_ids[i % len(equipment_type_ids)],
+            opening_balance=Decimal('100.00'),
+            closing_balance=Decimal('80.00'),
+            assigned_count=Decimal('15.00'),
+            expended_count=Decimal('5.00'),
+        )
+        # As annotated by Asset.objects.with_net_movement() in the dashboard view
+        asset.net_movement = Decimal('0.00')
+        return asset
+
+    def dashboard_context(self, size, base_ids, equipment_type_ids):
+        return {
+            'assets': [self.make_asset(i, base_ids, equipment_type_ids) for i in range(1, size + 1)],
+            'filter_form': DashboardFilterForm(),
+            'total_opening_balance': 0,
+            'total_closing_balance': 0,
+            'total_assigned': 0,
+            'total_expended': 0,
+            'recent_transactions': [],
+        }
+
+    def purchases_context(self, size, base_ids, equipment_type_ids):
+        now = timezone.now()
+        purchases = [
+            PurchaseRow.from_values(
+                i, f'PO-{i:06d}', equipment_type_ids[i % len(equipment_type_ids)],
+                Decimal('10.00'), 'Benchmark Supplier', Decimal('1250.00'),
+                ('PENDING', 'APPROVED', 'REJECTED')[i % 3], now,
+            )
+            for i in range(1, size + 1)
+        ]
+        return {'form': PurchaseForm(), 'purchases': purchases}
+
+    def transfers_context(self, size, base_ids, equipment_type_ids):
+        now = timezone.now()
+        transfers = [
+            TransferRow.from_values(
+                i, f'TR-{i:06d}', equipment_type_ids[i % len(equipment_type_ids)], Decimal('4.00'),
+                base_ids[i % len(base_ids)], base_ids[(i + 1) % len(base_ids)],
+                ('PENDING', 'IN_TRANSIT', 'COMPLETED')[i % 3], now,
+            )
+            for i in range(1, size + 1)
+        ]
+        return {'form': TransferForm(), 'transfers': transfers}
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from assets.forecasting import DEFAULT_ALPHA, DEFAULT_CATEGORIES, DEFAULT_WINDOW_DAYS, forecast_consumption
+
+
+class Command(BaseCommand):
+    help = 'Compute burn rates and days of supply for expendable assets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', nargs='+', default=list(DEFAULT_CATEGORIES),
+                            help='Equipment categories to forecast (default: AMMUNITION OTHER)')
+        parser.add_argument('--window', type=int, default=DEFAULT_WINDOW_DAYS,
+                            help='Days of expenditure history to use')
+        parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                            help='Smoothing factor of the exponentially weighted rate')
+
+    def handle(self, *args, **options):
+        count = forecast_consumption(options['categories'], options['window'], options['alpha'])
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} forecast(s) updated'))
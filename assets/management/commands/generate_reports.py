@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.reports import generate_reports
+
+
+class Command(BaseCommand):
+    help = 'Generate monthly inventory reports for every closed month that has none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First month to consider (YYYY-MM); default: month of the first asset')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Regenerate reports that already exist')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(f"{options['since']}-01")
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM')
+
+        reports = generate_reports(rebuild=options['rebuild'], since=since)
+        for report in reports:
+            self.stdout.write(f'  {report.period}: {report.lines.count()} line(s)')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(reports)} report(s) generated'))
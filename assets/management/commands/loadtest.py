@@ -0,0 +1,107 @@
+import json
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.loadtest import DEFAULT_MIX, ROLES, Stats, VirtualUser, parse_mix, prepare_fixtures
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except OSError:
+        return ''
+
+
+class Command(BaseCommand):
+    help = 'Replay a mix of demo-role traffic against a running server and report latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server under test')
+        parser.add_argument('--users', type=int, default=8, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds of traffic')
+        parser.add_argument(
+            '--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+            help='Scenario weights, e.g. dashboard=40,browse=20,purchase=12,transfer=10,assignment=10,expenditure=8',
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a repeatable scenario order')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+            fixtures = prepare_fixtures()
+        except (ValueError, LookupError) as exc:
+            raise CommandError(exc)
+        if fixtures['created']:
+            self.stdout.write(f"Created {fixtures['created']} load-test assets and personnel")
+
+        stats = Stats()
+        clock = {}
+
+        def start_clock():
+            clock['start'] = time.monotonic()
+            for user in users:
+                user.deadline = clock['start'] + options['duration']
+
+        # Released once every user has signed in, with the deadlines set
+        ready = threading.Barrier(options['users'] + 1, action=start_clock)
+        users = [
+            VirtualUser(
+                index, options['url'], mix, fixtures, stats, ready,
+                None if options['seed'] is None else options['seed'] + index,
+            )
+            for index in range(options['users'])
+        ]
+        for user in users:
+            user.start()
+        self.stdout.write(f"Signing in {options['users']} users as {', '.join(ROLES)}...")
+        ready.wait()
+        self.stdout.write(f"{options['users']} users x {options['duration']:g}s against {options['url']}")
+        for user in users:
+            user.join()
+        elapsed = time.monotonic() - clock['start']
+
+        summary = stats.summary(elapsed)
+        if not summary['requests']:
+            raise CommandError(f"No requests were made: {'; '.join(users[0].failures) or 'server unreachable'}")
+        self.report(summary)
+        failures = [failure for user in users for failure in user.failures]
+        for failure in failures[:5]:
+            self.stdout.write(self.style.WARNING(f'  {failure}'))
+
+        if options['json_path']:
+            result = {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'url': options['url'],
+                'users': options['users'],
+                'duration': elapsed,
+                'mix': mix,
+                **summary,
+            }
+            with open(options['json_path'], 'w') as handle:
+                json.dump(result, handle, indent=2)
+            self.stdout.write(f"Results written to {options['json_path']}")
+
+    def report(self, summary):
+        self.stdout.write(
+            f"\n  {'endpoint':<26} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'errors':>7}"
+        )
+        rows = [*summary['endpoints'].items(), ('total', summary)]
+        for endpoint, row in rows:
+            line = (
+                f"  {endpoint:<26} {row['requests']:8d} {row['throughput']:8.1f} {row['p50_ms']:8.1f} "
+                f"{row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {row['error_rate']:6.1%}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from assets.models import TransactionLog
+from military_config.routers import AUDIT, PRIMARY, audit_configured
+
+
+class Command(BaseCommand):
+    help = 'Copy the transaction log written to the primary before the audit database was configured'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not audit_configured():
+            raise CommandError('No audit database is configured (DB_AUDIT_NAME)')
+        if TransactionLog._meta.db_table not in connections[PRIMARY].introspection.table_names():
+            raise CommandError('The primary has no transaction log to copy')
+
+        source = TransactionLog.objects.using(PRIMARY).order_by('id')
+        target = TransactionLog.objects.using(AUDIT)
+        # Rows keep their ids, so an interrupted copy resumes where it stopped
+        last_id = target.order_by('-id').values_list('id', flat=True).first() or 0
+        if last_id > (source.reverse().values_list('id', flat=True).first() or 0):
+            raise CommandError(
+                'The audit database already holds rows of its own; '
+                'copy the log before the application writes to it'
+            )
+        copied = 0
+        while True:
+            batch = list(source.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            # bulk_create sends no signals: the rollup cube already counts these rows
+            with transaction.atomic(using=AUDIT):
+                target.bulk_create(batch)
+            copied += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'  {copied} row(s) copied')
+
+        # Rows were inserted with explicit ids; new rows must be numbered after them
+        with connections[AUDIT].cursor() as cursor:
+            for sql in connections[AUDIT].ops.sequence_reset_sql(no_style(), [TransactionLog]):
+                cursor.execute(sql)
+
+        missing = source.count() - target.filter(id__lte=last_id).count()
+        if missing:
+            raise CommandError(f'{missing} row(s) of the primary are missing from the audit database')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Transaction log copied: {copied} row(s). The primary keeps its copy of the '
+            f'{TransactionLog._meta.db_table} table; drop it once the audit database is verified.'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from assets.models import InTransitBalance
+
+
+class Command(BaseCommand):
+    help = 'Recompute the in-transit pipeline ledger from IN_TRANSIT transfers'
+
+    def handle(self, *args, **options):
+        InTransitBalance.rebuild()
+        lanes = InTransitBalance.objects.filter(quantity__gt=0).count()
+        self.stdout.write(self.style.SUCCESS(f'✓ Pipeline rebuilt: {lanes} lane(s) in transit'))
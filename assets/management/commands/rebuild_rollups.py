@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assets import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the ledger rollup cube from the transaction log'
+
+    def handle(self, *args, **options):
+        cells = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✓ Ledger rollups rebuilt: {cells} cell(s)'))
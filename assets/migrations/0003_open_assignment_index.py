@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_admin_date_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(condition=models.Q(('return_date__isnull', True)), fields=['personnel', 'asset'], name='assignments_open_idx'),
+        ),
+    ]
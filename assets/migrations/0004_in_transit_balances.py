@@ -0,0 +1,53 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill(apps, schema_editor):
+    """Seed the pipeline from IN_TRANSIT transfers and close logs of completed ones"""
+    Transfer = apps.get_model('assets', 'Transfer')
+    TransferLog = apps.get_model('assets', 'TransferLog')
+    InTransitBalance = apps.get_model('assets', 'InTransitBalance')
+
+    lanes = Transfer.objects.filter(status='IN_TRANSIT').values(
+        'from_base_id', 'to_base_id', 'equipment_type_id'
+    ).annotate(total=Sum('quantity')).order_by()
+    InTransitBalance.objects.bulk_create([
+        InTransitBalance(
+            from_base_id=lane['from_base_id'],
+            to_base_id=lane['to_base_id'],
+            equipment_type_id=lane['equipment_type_id'],
+            quantity=lane['total'],
+        )
+        for lane in lanes
+    ])
+    TransferLog.objects.filter(transfer__status='COMPLETED').update(status='COMPLETED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_open_assignment_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InTransitBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('equipment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='in_transit', to='assets.equipmenttype')),
+                ('from_base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='in_transit_out', to='assets.base')),
+                ('to_base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='in_transit_in', to='assets.base')),
+            ],
+            options={
+                'db_table': 'in_transit_balances',
+                'indexes': [models.Index(condition=models.Q(('quantity__gt', 0)), fields=['from_base', 'to_base'], name='in_transit_open_idx')],
+                'unique_together': {('from_base', 'to_base', 'equipment_type')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
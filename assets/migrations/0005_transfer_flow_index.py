@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_in_transit_balances'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['status', 'completion_date', 'from_base', 'to_base'], name='transfers_flow_idx'),
+        ),
+    ]
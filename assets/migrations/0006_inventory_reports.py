@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0005_transfer_flow_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField(unique=True)),
+                ('period_end', models.DateField()),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'inventory_reports',
+                'ordering': ['-period_start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventoryReportLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opening_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('purchases', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transfers_in', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transfers_out', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('assigned', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('returned', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expended', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('closing_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_lines', to='assets.base')),
+                ('equipment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_lines', to='assets.equipmenttype')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='assets.inventoryreport')),
+            ],
+            options={
+                'db_table': 'inventory_report_lines',
+                'unique_together': {('report', 'base', 'equipment_type')},
+            },
+        ),
+    ]
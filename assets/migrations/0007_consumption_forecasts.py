@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0006_inventory_reports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumptionForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_days', models.PositiveIntegerField()),
+                ('sma_rate', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('ewma_rate', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('days_of_supply', models.DecimalField(blank=True, db_index=True, decimal_places=1, max_digits=12, null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('asset', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='assets.asset')),
+            ],
+            options={
+                'db_table': 'consumption_forecasts',
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0007_consumption_forecasts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockThreshold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minimum', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('clear_margin', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_thresholds', to='assets.base')),
+                ('equipment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_thresholds', to='assets.equipmenttype')),
+            ],
+            options={
+                'db_table': 'stock_thresholds',
+                'unique_together': {('base', 'equipment_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('CLEARED', 'Cleared')], default='ACTIVE', max_length=20)),
+                ('minimum', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('triggered_balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('triggered_at', models.DateTimeField()),
+                ('cleared_balance', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('cleared_at', models.DateTimeField(blank=True, null=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='assets.asset')),
+                ('threshold', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='assets.stockthreshold')),
+            ],
+            options={
+                'db_table': 'stock_alerts',
+                'ordering': ['-triggered_at'],
+                'indexes': [models.Index(fields=['status', '-triggered_at'], name='stock_alert_status_552af9_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'ACTIVE')), fields=('asset',), name='stock_alerts_one_active_per_asset')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    """Build the cube from the existing transaction log"""
+    TransactionLog = apps.get_model('assets', 'TransactionLog')
+    LedgerRollup = apps.get_model('assets', 'LedgerRollup')
+
+    rows = TransactionLog.objects.annotate(month=TruncMonth('created_at')).values(
+        'asset__base_id', 'asset__equipment_type__category', 'month', 'transaction_type'
+    ).annotate(total=Sum('quantity'), count=Count('id')).order_by()
+    LedgerRollup.objects.bulk_create([
+        LedgerRollup(
+            base_id=row['asset__base_id'],
+            category=row['asset__equipment_type__category'],
+            month=timezone.localdate(row['month']),
+            transaction_type=row['transaction_type'],
+            quantity=row['total'],
+            entries=row['count'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0008_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('VEHICLE', 'Vehicle'), ('WEAPON', 'Weapon'), ('AMMUNITION', 'Ammunition'), ('OTHER', 'Other')], max_length=50)),
+                ('month', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('PURCHASE', 'Purchase'), ('TRANSFER_IN', 'Transfer In'), ('TRANSFER_OUT', 'Transfer Out'), ('ASSIGNMENT', 'Assignment'), ('EXPENDITURE', 'Expenditure'), ('OPENING_BALANCE', 'Opening Balance')], max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_rollups', to='assets.base')),
+            ],
+            options={
+                'db_table': 'ledger_rollups',
+                'indexes': [models.Index(fields=['month', 'transaction_type'], name='ledger_roll_month_f62ccf_idx')],
+                'unique_together': {('base', 'category', 'month', 'transaction_type')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
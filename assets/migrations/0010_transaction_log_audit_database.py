@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0009_ledger_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transactionlog',
+            name='asset',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='transaction_logs', to='assets.asset'),
+        ),
+        migrations.AlterField(
+            model_name='transactionlog',
+            name='created_by',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='transaction_logs', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
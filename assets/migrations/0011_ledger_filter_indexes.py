@@ -0,0 +1,39 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0010_transaction_log_audit_database'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['asset', 'return_date'], name='assignments_asset_return_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['asset', 'status'], name='purchases_asset_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['status', '-purchase_date'], name='purchases_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['from_base', 'status'], name='transfers_from_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['to_base', 'status'], name='transfers_to_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferlog',
+            index=models.Index(condition=models.Q(('status', 'COMPLETED')), fields=['asset', 'transfer_type'], name='transfer_logs_completed_idx'),
+        ),
+    ]
@@ -1,9 +1,17 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models import Q, Sum, F
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from collections import defaultdict
 from decimal import Decimal
 from datetime import datetime
 
+from assets.alerts import schedule_evaluation
+from assets.ledger import transactions_recorded
+from assets.reference import base_name, equipment_type_name
+from military_config.db import ledger_atomic
+
 
 class Base(models.Model):
     """Military base/installation"""
@@ -44,6 +52,28 @@ class EquipmentType(models.Model):
         return self.name
 
 
+class AssetQuerySet(models.QuerySet):
+    def with_net_movement(self):
+        """Annotate net_movement (see Asset.calculate_net_movement) with one subquery per term"""
+        amount = DecimalField(max_digits=12, decimal_places=2)
+
+        def total(queryset):
+            per_asset = queryset.filter(asset=OuterRef('pk')).order_by().values('asset')
+            return Coalesce(
+                Subquery(per_asset.annotate(total=Sum('quantity')).values('total')),
+                Value(Decimal('0')),
+                output_field=amount,
+            )
+
+        completed = TransferLog.objects.filter(status='COMPLETED')
+        return self.annotate(net_movement=models.ExpressionWrapper(
+            total(Purchase.objects.filter(status='APPROVED'))
+            + total(completed.filter(transfer_type='IN'))
+            - total(completed.filter(transfer_type='OUT')),
+            output_field=amount,
+        ))
+
+
 class Asset(models.Model):
     """Individual asset with opening and closing balances"""
     equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE, related_name='assets')
@@ -60,12 +90,14 @@ class Asset(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AssetQuerySet.as_manager()
+
     class Meta:
         db_table = 'assets'
         unique_together = ('equipment_type', 'base')
 
     def __str__(self):
-        return f"{self.equipment_type.name} at {self.base.name}"
+        return f"{equipment_type_name(self.equipment_type_id)} at {base_name(self.base_id)}"
 
     def calculate_net_movement(self):
         """Calculate: Purchases + Transfers In - Transfers Out"""
@@ -93,6 +125,7 @@ class Asset(models.Model):
             self.assigned_count - self.expended_count
         )
         self.save()
+        schedule_evaluation(self.id)
 
 
 class Personnel(models.Model):
@@ -112,6 +145,73 @@ class Personnel(models.Model):
         return f"{self.user.get_full_name()} ({self.rank})"
 
 
+class PurchaseQuerySet(models.QuerySet):
+    BATCH_SIZE = 500
+
+    def approve(self, user):
+        """
+        Approve every PENDING purchase in the queryset as one set-based operation.
+
+        Purchases are flipped in batched UPDATEs, each affected asset gets a
+        single UPDATE with the summed quantity of its purchases, and the
+        PURCHASE transaction logs are bulk-inserted. The number of queries
+        grows with the number of distinct assets, not with the number of
+        purchases. Returns the number of purchases approved.
+        """
+        with ledger_atomic():
+            pending = list(
+                self.filter(status='PENDING')
+                .select_for_update()
+                .values_list('id', 'asset_id', 'quantity')
+            )
+            if not pending:
+                return 0
+
+            now = timezone.now()
+            approved = []
+            for start in range(0, len(pending), self.BATCH_SIZE):
+                batch = pending[start:start + self.BATCH_SIZE]
+                batch_ids = [purchase_id for purchase_id, _, _ in batch]
+                changed = Purchase.objects.filter(id__in=batch_ids, status='PENDING').update(
+                    status='APPROVED', approval_date=now, approved_by=user, updated_at=now
+                )
+                if changed < len(batch):
+                    # Approved concurrently since they were read (select_for_update is a no-op on
+                    # SQLite): only the purchases this call flipped may move stock
+                    ours = set(Purchase.objects.filter(
+                        id__in=batch_ids, approval_date=now, approved_by=user
+                    ).values_list('id', flat=True))
+                    batch = [row for row in batch if row[0] in ours]
+                approved.extend(batch)
+            if not approved:
+                return 0
+
+            deltas = defaultdict(Decimal)
+            for _, asset_id, quantity in approved:
+                deltas[asset_id] += quantity
+            for asset_id, delta in deltas.items():
+                Asset.objects.filter(id=asset_id).update(
+                    closing_balance=F('closing_balance') + delta, updated_at=now
+                )
+
+            assets = Asset.objects.only('id', 'base_id', 'equipment_type_id').in_bulk(list(deltas))
+            logs = TransactionLog.objects.bulk_create([
+                TransactionLog(
+                    asset=assets[asset_id],
+                    transaction_type='PURCHASE',
+                    quantity=quantity,
+                    related_object_id=purchase_id,
+                    created_by=user,
+                    created_at=now,
+                )
+                for purchase_id, asset_id, quantity in approved
+            ], batch_size=self.BATCH_SIZE)
+            transactions_recorded.send(sender=TransactionLog, logs=logs)
+            schedule_evaluation(*deltas)
+
+        return len(approved)
+
+
 class Purchase(models.Model):
     """Track asset purchases"""
     STATUS_CHOICES = (
@@ -122,7 +222,7 @@ class Purchase(models.Model):
     
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='purchases')
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
-    purchase_date = models.DateTimeField(auto_now_add=True)
+    purchase_date = models.DateTimeField(auto_now_add=True, db_index=True)
     approval_date = models.DateTimeField(null=True, blank=True)
     supplier = models.CharField(max_length=255)
     reference_number = models.CharField(max_length=100, unique=True)
@@ -134,13 +234,21 @@ class Purchase(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PurchaseQuerySet.as_manager()
+
     class Meta:
         db_table = 'purchases'
         ordering = ['-purchase_date']
+        indexes = [
+            # Approved totals per asset (net movement) and the status filter of the purchases page
+            models.Index(fields=['asset', 'status'], name='purchases_asset_status_idx'),
+            models.Index(fields=['status', '-purchase_date'], name='purchases_status_date_idx'),
+        ]
 
     def __str__(self):
-        return f"Purchase: {self.asset.equipment_type.name} ({self.quantity})"
+        return f"Purchase: {equipment_type_name(self.asset.equipment_type_id)} ({self.quantity})"
 
+    @ledger_atomic()
     def approve(self, user):
         """Approve purchase and update asset balance"""
         if self.status == 'APPROVED':
@@ -179,7 +287,7 @@ class Transfer(models.Model):
     to_base = models.ForeignKey(Base, on_delete=models.CASCADE, related_name='transfers_in')
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
-    initiated_date = models.DateTimeField(auto_now_add=True)
+    initiated_date = models.DateTimeField(auto_now_add=True, db_index=True)
     completion_date = models.DateTimeField(null=True, blank=True)
     reference_number = models.CharField(max_length=100, unique=True)
     notes = models.TextField(blank=True)
@@ -193,10 +301,34 @@ class Transfer(models.Model):
     class Meta:
         db_table = 'transfers'
         ordering = ['-initiated_date']
+        indexes = [
+            models.Index(
+                fields=['status', 'completion_date', 'from_base', 'to_base'],
+                name='transfers_flow_idx',
+            ),
+            # A base sees transfers from or to it, optionally by status
+            models.Index(fields=['from_base', 'status'], name='transfers_from_status_idx'),
+            models.Index(fields=['to_base', 'status'], name='transfers_to_status_idx'),
+        ]
 
     def __str__(self):
-        return f"Transfer: {self.equipment_type.name} from {self.from_base.name} to {self.to_base.name}"
+        return (
+            f"Transfer: {equipment_type_name(self.equipment_type_id)} "
+            f"from {base_name(self.from_base_id)} to {base_name(self.to_base_id)}"
+        )
 
+    def dispatch(self):
+        """Move a PENDING transfer to IN_TRANSIT and add it to the pipeline"""
+        if self.status != 'PENDING':
+            return False
+        
+        with transaction.atomic():
+            self.status = 'IN_TRANSIT'
+            self.save()
+            InTransitBalance.adjust(self, self.quantity)
+        return True
+
+    @ledger_atomic()
     def complete_transfer(self, user):
         """Complete transfer and update both asset balances"""
         if self.status == 'COMPLETED':
@@ -211,11 +343,16 @@ class Transfer(models.Model):
         
         to_asset.closing_balance += self.quantity
         to_asset.save()
+        schedule_evaluation(from_asset.id, to_asset.id)
+        
+        if self.status == 'IN_TRANSIT':
+            InTransitBalance.adjust(self, -self.quantity)
         
         self.status = 'COMPLETED'
         self.completion_date = datetime.now()
         self.approved_by = user
         self.save()
+        self.logs.update(status='COMPLETED', updated_at=timezone.now())
         
         # Log transactions for both bases
         TransactionLog.objects.create(
@@ -258,17 +395,86 @@ class TransferLog(models.Model):
 
     class Meta:
         db_table = 'transfer_logs'
+        indexes = [
+            # Net movement only sums completed legs per asset and direction
+            models.Index(
+                fields=['asset', 'transfer_type'],
+                condition=Q(status='COMPLETED'),
+                name='transfer_logs_completed_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.asset} - {self.transfer_type}: {self.quantity}"
 
 
+class InTransitBalance(models.Model):
+    """Quantity currently in transit per base pair and equipment type"""
+    from_base = models.ForeignKey(Base, on_delete=models.CASCADE, related_name='in_transit_out')
+    to_base = models.ForeignKey(Base, on_delete=models.CASCADE, related_name='in_transit_in')
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE, related_name='in_transit')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'in_transit_balances'
+        unique_together = ('from_base', 'to_base', 'equipment_type')
+        indexes = [
+            # The pipeline only reads lanes that currently carry stock
+            models.Index(
+                fields=['from_base', 'to_base'],
+                condition=Q(quantity__gt=0),
+                name='in_transit_open_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{equipment_type_name(self.equipment_type_id)} "
+            f"{base_name(self.from_base_id)} -> {base_name(self.to_base_id)}: {self.quantity}"
+        )
+
+    @classmethod
+    def adjust(cls, transfer, delta):
+        """Add delta to the lane of a transfer with a single UPDATE"""
+        lane = {
+            'from_base_id': transfer.from_base_id,
+            'to_base_id': transfer.to_base_id,
+            'equipment_type_id': transfer.equipment_type_id,
+        }
+        updated = cls.objects.filter(**lane).update(
+            quantity=F('quantity') + delta, updated_at=timezone.now()
+        )
+        if not updated and delta > 0:
+            balance, created = cls.objects.get_or_create(**lane, defaults={'quantity': delta})
+            if not created:
+                cls.objects.filter(pk=balance.pk).update(quantity=F('quantity') + delta)
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every lane from the IN_TRANSIT transfers"""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            lanes = Transfer.objects.filter(status='IN_TRANSIT').values(
+                'from_base_id', 'to_base_id', 'equipment_type_id'
+            ).annotate(total=Sum('quantity')).order_by()
+            cls.objects.bulk_create([
+                cls(
+                    from_base_id=lane['from_base_id'],
+                    to_base_id=lane['to_base_id'],
+                    equipment_type_id=lane['equipment_type_id'],
+                    quantity=lane['total'],
+                )
+                for lane in lanes
+            ])
+
+
 class Assignment(models.Model):
     """Asset assignment to personnel"""
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='assignments')
     personnel = models.ForeignKey(Personnel, on_delete=models.CASCADE, related_name='assignments')
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
-    assignment_date = models.DateTimeField(auto_now_add=True)
+    assignment_date = models.DateTimeField(auto_now_add=True, db_index=True)
     return_date = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True)
     assigned_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='assignments_created')
@@ -278,10 +484,20 @@ class Assignment(models.Model):
     class Meta:
         db_table = 'assignments'
         ordering = ['-assignment_date']
+        indexes = [
+            # Only open assignments are looked up per person; returned rows stay out of the index
+            models.Index(
+                fields=['personnel', 'asset'],
+                condition=Q(return_date__isnull=True),
+                name='assignments_open_idx',
+            ),
+            models.Index(fields=['asset', 'return_date'], name='assignments_asset_return_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.personnel} - {self.asset.equipment_type.name}: {self.quantity}"
+        return f"{self.personnel} - {equipment_type_name(self.asset.equipment_type_id)}: {self.quantity}"
 
+    @ledger_atomic()
     def save(self, *args, **kwargs):
         """Update asset assigned count when assignment is created"""
         if not self.pk:  # New assignment
@@ -314,7 +530,7 @@ class Expenditure(models.Model):
     """Track expended/consumed assets"""
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='expenditures')
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
-    expended_date = models.DateTimeField(auto_now_add=True)
+    expended_date = models.DateTimeField(auto_now_add=True, db_index=True)
     reason = models.CharField(max_length=255)
     reference_number = models.CharField(max_length=100, unique=True)
     notes = models.TextField(blank=True)
@@ -327,8 +543,9 @@ class Expenditure(models.Model):
         ordering = ['-expended_date']
 
     def __str__(self):
-        return f"Expenditure: {self.asset.equipment_type.name} ({self.quantity})"
+        return f"Expenditure: {equipment_type_name(self.asset.equipment_type_id)} ({self.quantity})"
 
+    @ledger_atomic()
     def save(self, *args, **kwargs):
         """Update asset expended count when expenditure is recorded"""
         if not self.pk:  # New expenditure
@@ -358,12 +575,19 @@ class TransactionLog(models.Model):
         ('OPENING_BALANCE', 'Opening Balance'),
     )
     
-    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='transaction_logs')
+    # The log may live in a separate audit database (see military_config/routers.py), so
+    # its foreign keys are not enforced by the database; the cascade to logs on asset
+    # deletion and the SET_NULL on user deletion are applied by assets.signals.
+    asset = models.ForeignKey(
+        Asset, on_delete=models.DO_NOTHING, db_constraint=False, related_name='transaction_logs'
+    )
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
     related_object_id = models.IntegerField(null=True, blank=True)
     related_object_type = models.CharField(max_length=100, null=True, blank=True)
-    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='transaction_logs')
+    created_by = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='transaction_logs'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
@@ -372,6 +596,7 @@ class TransactionLog(models.Model):
         db_table = 'transaction_logs'
         ordering = ['-created_at']
         indexes = [
+            models.Index(fields=['-created_at']),
             models.Index(fields=['asset', '-created_at']),
             models.Index(fields=['created_by', '-created_at']),
             models.Index(fields=['transaction_type', '-created_at']),
@@ -379,3 +604,129 @@ class TransactionLog(models.Model):
 
     def __str__(self):
         return f"{self.get_transaction_type_display()} - {self.asset}: {self.quantity}"
+
+
+class InventoryReport(models.Model):
+    """Inventory figures of one closed month, generated by `generate_reports`"""
+    period_start = models.DateField(unique=True)
+    period_end = models.DateField()
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'inventory_reports'
+        ordering = ['-period_start']
+
+    def __str__(self):
+        return f"Inventory report {self.period_start:%Y-%m}"
+
+    @property
+    def period(self):
+        return f"{self.period_start:%Y-%m}"
+
+
+class InventoryReportLine(models.Model):
+    """Movement of one base and equipment type during a report period"""
+    report = models.ForeignKey(InventoryReport, on_delete=models.CASCADE, related_name='lines')
+    base = models.ForeignKey(Base, on_delete=models.CASCADE, related_name='report_lines')
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE, related_name='report_lines')
+    opening_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    purchases = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transfers_in = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transfers_out = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    assigned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    returned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expended = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    closing_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'inventory_report_lines'
+        unique_together = ('report', 'base', 'equipment_type')
+
+    def __str__(self):
+        return f"{self.report} - {equipment_type_name(self.equipment_type_id)} at {base_name(self.base_id)}"
+
+
+class ConsumptionForecast(models.Model):
+    """Burn rates and days of supply of an asset, written by `forecast_consumption`"""
+    asset = models.OneToOneField(Asset, on_delete=models.CASCADE, related_name='forecast')
+    window_days = models.PositiveIntegerField()
+    sma_rate = models.DecimalField(max_digits=12, decimal_places=3)
+    ewma_rate = models.DecimalField(max_digits=12, decimal_places=3)
+    days_of_supply = models.DecimalField(max_digits=12, decimal_places=1, null=True, blank=True, db_index=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'consumption_forecasts'
+
+    def __str__(self):
+        return f"Forecast: {self.asset} ({self.days_of_supply} days)"
+
+
+class StockThreshold(models.Model):
+    """Minimum stock of an equipment type at a base"""
+    base = models.ForeignKey(Base, on_delete=models.CASCADE, related_name='stock_thresholds')
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.CASCADE, related_name='stock_thresholds')
+    minimum = models.DecimalField(max_digits=10, decimal_places=2)
+    # An active alert only clears once the balance is back above minimum + clear_margin
+    clear_margin = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'stock_thresholds'
+        unique_together = ('base', 'equipment_type')
+
+    def __str__(self):
+        return f"{equipment_type_name(self.equipment_type_id)} at {base_name(self.base_id)} >= {self.minimum}"
+
+
+class StockAlert(models.Model):
+    """Low-stock alert of an asset, raised and cleared by assets.alerts"""
+    STATUS_CHOICES = (
+        ('ACTIVE', 'Active'),
+        ('CLEARED', 'Cleared'),
+    )
+
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='stock_alerts')
+    threshold = models.ForeignKey(StockThreshold, on_delete=models.CASCADE, related_name='alerts')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
+    minimum = models.DecimalField(max_digits=10, decimal_places=2)
+    triggered_balance = models.DecimalField(max_digits=10, decimal_places=2)
+    triggered_at = models.DateTimeField()
+    cleared_balance = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    cleared_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'stock_alerts'
+        ordering = ['-triggered_at']
+        indexes = [
+            models.Index(fields=['status', '-triggered_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['asset'], condition=Q(status='ACTIVE'), name='stock_alerts_one_active_per_asset'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Low stock: {self.asset} ({self.triggered_balance} < {self.minimum})"
+
+
+class LedgerRollup(models.Model):
+    """Transaction totals per base, equipment category, month and transaction type"""
+    base = models.ForeignKey(Base, on_delete=models.CASCADE, related_name='ledger_rollups')
+    category = models.CharField(max_length=50, choices=EquipmentType.CATEGORY_CHOICES)
+    month = models.DateField()
+    transaction_type = models.CharField(max_length=20, choices=TransactionLog.TRANSACTION_TYPES)
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    entries = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'ledger_rollups'
+        unique_together = ('base', 'category', 'month', 'transaction_type')
+        indexes = [
+            models.Index(fields=['month', 'transaction_type']),
+        ]
+
+    def __str__(self):
+        return f"{base_name(self.base_id)} {self.category} {self.month:%Y-%m} {self.transaction_type}: {self.quantity}"
@@ -0,0 +1,134 @@
+"""
+In-process cache of reference data (bases and equipment types).
+
+Both tables change a few times a year but are read on almost every request,
+so each worker keeps a snapshot in memory and resolves names from it without
+touching the database. A version token in the shared (cross-worker) cache is
+bumped by post_save/post_delete signals; workers compare it at most once per
+REFERENCE_CACHE_CHECK_INTERVAL seconds and reload when it has changed.
+"""
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+VERSION_KEY = 'reference_data:version'
+
+BaseRef = namedtuple('BaseRef', ['id', 'name', 'location'])
+EquipmentTypeRef = namedtuple(
+    'EquipmentTypeRef', ['id', 'name', 'category', 'category_display', 'unit_of_measure']
+)
+
+
+class ReferenceData:
+    """Snapshot of the reference tables, replaced (never updated) when they change"""
+
+    def __init__(self, version, bases, equipment_types):
+        self.version = version
+        self.bases = bases
+        self.equipment_types = equipment_types
+        # (table, pk) pairs known to be absent from this version; the only mutable part
+        self.missing = set()
+
+    @classmethod
+    def load(cls, version):
+        from assets.models import Base, EquipmentType
+
+        # Read from the primary: rows from a lagging replica would be cached under the new version
+        categories = dict(EquipmentType.CATEGORY_CHOICES)
+        bases = {
+            row[0]: BaseRef(*row)
+            for row in Base.objects.using('default').order_by('name').values_list('id', 'name', 'location')
+        }
+        equipment_types = {
+            pk: EquipmentTypeRef(pk, name, category, categories.get(category, category), unit)
+            for pk, name, category, unit in EquipmentType.objects.using('default').order_by('name').values_list(
+                'id', 'name', 'category', 'unit_of_measure'
+            )
+        }
+        return cls(version, bases, equipment_types)
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def _shared_version():
+    cache = caches['shared']
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_reference_data(force_check=False):
+    """Return the current snapshot, reloading it if another worker changed the data"""
+    global _snapshot, _checked_at
+    # Imported here: prometheus_client is only loaded once something is counted
+    from tracking.metrics import record_cache_lookup
+
+    now = time.monotonic()
+    snapshot = _snapshot
+    interval = getattr(settings, 'REFERENCE_CACHE_CHECK_INTERVAL', 1.0)
+    if snapshot is not None and not force_check and now - _checked_at < interval:
+        record_cache_lookup('reference', True)
+        return snapshot
+
+    version = _shared_version()
+    with _lock:
+        _checked_at = now
+        if _snapshot is not None and _snapshot.version == version:
+            record_cache_lookup('reference', True)
+            return _snapshot
+        record_cache_lookup('reference', False)
+        _snapshot = ReferenceData.load(version)
+        return _snapshot
+
+
+def invalidate():
+    """Bump the shared version and drop this worker's snapshot"""
+    global _snapshot
+    caches['shared'].set(VERSION_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _snapshot = None
+
+
+def _resolve(table, pk):
+    """Look a primary key up in one table of the snapshot"""
+    data = get_reference_data()
+    refs = getattr(data, table)
+    if pk is None or pk in refs or (table, pk) in data.missing:
+        return refs.get(pk)
+
+    # Possibly created since the last check; an id still absent is not checked again until the version changes
+    data = get_reference_data(force_check=True)
+    refs = getattr(data, table)
+    if pk not in refs:
+        data.missing.add((table, pk))
+    return refs.get(pk)
+
+
+def get_base(base_id):
+    """BaseRef for a primary key, or None"""
+    return _resolve('bases', base_id)
+
+
+def get_equipment_type(equipment_type_id):
+    """EquipmentTypeRef for a primary key, or None"""
+    return _resolve('equipment_types', equipment_type_id)
+
+
+def base_name(base_id):
+    base = get_base(base_id)
+    return base.name if base else ''
+
+
+def equipment_type_name(equipment_type_id):
+    equipment_type = get_equipment_type(equipment_type_id)
+    return equipment_type.name if equipment_type else ''
@@ -0,0 +1,159 @@
+"""
+Monthly inventory reports.
+
+generate_reports() computes, for every closed month (one that ended before
+the current month began), the opening balance, purchases, transfers in and
+out, assignments, returns, expenditures and closing balance of every asset,
+and stores them as InventoryReport / InventoryReportLine rows. Report pages
+and downloads read those rows instead of re-aggregating the ledger.
+
+Movements come from grouped queries over the indexed date columns: purchases,
+transfers and expenditures from TransactionLog, assignments and returns from
+Assignment (returns are not written to the transaction log). The number of
+queries does not depend on how many months or assets are generated.
+Opening balances roll forward from each asset's opening balance, which is
+counted from the month the asset was created.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Min, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from assets.analytics import local_day, start_of_day
+from assets.models import Asset, Assignment, InventoryReport, InventoryReportLine, TransactionLog
+
+LOG_COLUMNS = {
+    'PURCHASE': 'purchases',
+    'TRANSFER_IN': 'transfers_in',
+    'TRANSFER_OUT': 'transfers_out',
+    'EXPENDITURE': 'expended',
+}
+MOVEMENT_COLUMNS = ('purchases', 'transfers_in', 'transfers_out', 'assigned', 'returned', 'expended')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def closed_periods(since=None):
+    """First days of every month from `since` (or the first asset) up to last month"""
+    if since is None:
+        first_created = Asset.objects.aggregate(first=Min('created_at'))['first']
+        if first_created is None:
+            return []
+        since = local_day(first_created)
+
+    current = month_start(timezone.localdate())
+    periods = []
+    period = month_start(since)
+    while period < current:
+        periods.append(period)
+        period = next_month(period)
+    return periods
+
+
+def net_change(movement):
+    return (
+        movement['purchases'] + movement['transfers_in'] - movement['transfers_out']
+        - movement['assigned'] + movement['returned'] - movement['expended']
+    )
+
+
+def empty_movement():
+    return dict.fromkeys(MOVEMENT_COLUMNS, Decimal('0'))
+
+
+def collect_movements(start, end):
+    """
+    Per-asset movements before `start` and per (asset, month) in [start, end).
+
+    Returns (baseline, monthly): baseline[asset_id] and monthly[(asset_id, month)]
+    map column names to quantities.
+    """
+    start_at, end_at = start_of_day(start), start_of_day(end)
+    baseline = defaultdict(empty_movement)
+    monthly = defaultdict(empty_movement)
+
+    def add(target, key, column, quantity):
+        target[key][column] += quantity or Decimal('0')
+
+    logs = TransactionLog.objects.filter(transaction_type__in=list(LOG_COLUMNS)).order_by()
+    for row in logs.filter(created_at__lt=start_at).values('asset_id', 'transaction_type').annotate(
+        total=Sum('quantity')
+    ):
+        add(baseline, row['asset_id'], LOG_COLUMNS[row['transaction_type']], row['total'])
+    for row in logs.filter(created_at__gte=start_at, created_at__lt=end_at).annotate(
+        month=TruncMonth('created_at')
+    ).values('asset_id', 'transaction_type', 'month').annotate(total=Sum('quantity')):
+        key = (row['asset_id'], local_day(row['month']))
+        add(monthly, key, LOG_COLUMNS[row['transaction_type']], row['total'])
+
+    for column, date_field in (('assigned', 'assignment_date'), ('returned', 'return_date')):
+        assignments = Assignment.objects.filter(**{f'{date_field}__isnull': False}).order_by()
+        for row in assignments.filter(**{f'{date_field}__lt': start_at}).values('asset_id').annotate(
+            total=Sum('quantity')
+        ):
+            add(baseline, row['asset_id'], column, row['total'])
+        for row in assignments.filter(
+            **{f'{date_field}__gte': start_at, f'{date_field}__lt': end_at}
+        ).annotate(month=TruncMonth(date_field)).values('asset_id', 'month').annotate(total=Sum('quantity')):
+            add(monthly, (row['asset_id'], local_day(row['month'])), column, row['total'])
+
+    return baseline, monthly
+
+
+def generate_reports(rebuild=False, since=None):
+    """Create the reports of closed months that have none yet (all of them with rebuild)"""
+    periods = closed_periods(since)
+    if not rebuild:
+        existing = set(InventoryReport.objects.values_list('period_start', flat=True))
+        periods = [period for period in periods if period not in existing]
+    if not periods:
+        return []
+
+    start, end = periods[0], next_month(periods[-1])
+    targets = set(periods)
+    assets = list(Asset.objects.values_list('id', 'base_id', 'equipment_type_id', 'opening_balance', 'created_at'))
+    baseline, monthly = collect_movements(start, end)
+
+    balances = {asset_id: opening + net_change(baseline[asset_id]) for asset_id, _, _, opening, _ in assets}
+    generated = []
+    period = start
+    while period < end:
+        period_end = next_month(period)
+        lines = []
+        for asset_id, base_id, equipment_type_id, _, created_at in assets:
+            if local_day(created_at) >= period_end:
+                continue
+            movement = monthly.get((asset_id, period), empty_movement())
+            opening = balances[asset_id]
+            balances[asset_id] = opening + net_change(movement)
+            lines.append(InventoryReportLine(
+                base_id=base_id,
+                equipment_type_id=equipment_type_id,
+                opening_balance=opening,
+                closing_balance=balances[asset_id],
+                **movement,
+            ))
+
+        if period in targets:
+            with transaction.atomic():
+                report, _ = InventoryReport.objects.update_or_create(
+                    period_start=period, defaults={'period_end': period_end - timedelta(days=1)}
+                )
+                report.lines.all().delete()
+                for line in lines:
+                    line.report = report
+                InventoryReportLine.objects.bulk_create(lines, batch_size=500)
+            generated.append(report)
+        period = period_end
+
+    return generated
@@ -0,0 +1,145 @@
+"""
+Pre-aggregated ledger cube.
+
+LedgerRollup holds the quantity and number of TransactionLog rows per
+(base, equipment category, month, transaction type). It is maintained from
+the transactions_recorded signal in the same transaction as the logs, so
+the cube and the ledger commit or roll back together (unless the log lives
+in the audit database); rebuild() recomputes it from the ledger with one
+grouped query.
+
+pivot() answers ad-hoc questions by grouping the cube (a few rows per base,
+category and month) on any subset of its dimensions, with the time dimension
+at month, quarter or year granularity.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncYear
+
+from assets.analytics import local_day
+from assets.models import Asset, LedgerRollup, TransactionLog
+from assets.reference import get_equipment_type
+
+DIMENSIONS = ('base', 'category', 'period', 'transaction_type')
+GRANULARITIES = {'month': None, 'quarter': TruncQuarter, 'year': TruncYear}
+
+
+def cell_key(log):
+    equipment_type = get_equipment_type(log.asset.equipment_type_id)
+    return (
+        log.asset.base_id,
+        equipment_type.category if equipment_type else 'OTHER',
+        local_day(log.created_at).replace(day=1),
+        log.transaction_type,
+    )
+
+
+def apply_logs(logs, sign=1):
+    """Add (or with sign=-1 remove) TransactionLog rows to the cube"""
+    cells = defaultdict(lambda: [Decimal('0'), 0])
+    for log in logs:
+        cell = cells[cell_key(log)]
+        cell[0] += log.quantity
+        cell[1] += 1
+
+    for (base_id, category, month, transaction_type), (quantity, entries) in cells.items():
+        lookup = {'base_id': base_id, 'category': category, 'month': month, 'transaction_type': transaction_type}
+        changes = {
+            'quantity': F('quantity') + sign * quantity,
+            'entries': F('entries') + sign * entries,
+        }
+        if LedgerRollup.objects.filter(**lookup).update(**changes) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                LedgerRollup.objects.create(**lookup, quantity=quantity, entries=entries)
+        except IntegrityError:
+            # Created concurrently by another writer
+            LedgerRollup.objects.filter(**lookup).update(**changes)
+
+
+def rebuild():
+    """Recompute the whole cube from the transaction log"""
+    # Grouped by asset id rather than joined: the log may live in the audit database
+    rows = TransactionLog.objects.annotate(month=TruncMonth('created_at')).values(
+        'asset_id', 'month', 'transaction_type'
+    ).annotate(total=Sum('quantity'), count=Count('id')).order_by()
+    assets = {
+        asset_id: (base_id, equipment_type_id)
+        for asset_id, base_id, equipment_type_id in Asset.objects.values_list('id', 'base_id', 'equipment_type_id')
+    }
+
+    cells = defaultdict(lambda: [Decimal('0'), 0])
+    for row in rows:
+        if row['asset_id'] not in assets:
+            continue
+        base_id, equipment_type_id = assets[row['asset_id']]
+        equipment_type = get_equipment_type(equipment_type_id)
+        category = equipment_type.category if equipment_type else 'OTHER'
+        cell = cells[(base_id, category, local_day(row['month']), row['transaction_type'])]
+        cell[0] += row['total']
+        cell[1] += row['count']
+
+    with transaction.atomic():
+        LedgerRollup.objects.all().delete()
+        LedgerRollup.objects.bulk_create([
+            LedgerRollup(
+                base_id=base_id, category=category, month=month, transaction_type=transaction_type,
+                quantity=quantity, entries=entries,
+            )
+            for (base_id, category, month, transaction_type), (quantity, entries) in cells.items()
+        ], batch_size=1000)
+    return len(cells)
+
+
+def pivot(dimensions, granularity='month', base_id=None, filters=None):
+    """
+    Totals of the cube grouped by the given dimensions.
+
+    filters may restrict base, category, transaction_type (lists) and the
+    month range (start, end: first days of months, inclusive).
+    """
+    cube = LedgerRollup.objects.all()
+    if base_id is not None:
+        cube = cube.filter(base_id=base_id)
+
+    filters = filters or {}
+    if filters.get('base'):
+        cube = cube.filter(base_id__in=filters['base'])
+    if filters.get('category'):
+        cube = cube.filter(category__in=filters['category'])
+    if filters.get('transaction_type'):
+        cube = cube.filter(transaction_type__in=filters['transaction_type'])
+    if filters.get('start'):
+        cube = cube.filter(month__gte=filters['start'])
+    if filters.get('end'):
+        cube = cube.filter(month__lte=filters['end'])
+
+    columns = {'base': 'base_id', 'category': 'category', 'transaction_type': 'transaction_type'}
+    if 'period' in dimensions:
+        trunc = GRANULARITIES[granularity]
+        if trunc is None:
+            columns['period'] = 'month'
+        else:
+            cube = cube.annotate(period=trunc('month'))
+            columns['period'] = 'period'
+
+    group_by = [columns[dimension] for dimension in dimensions]
+    if not group_by:
+        totals = cube.aggregate(quantity=Sum('quantity'), entries=Sum('entries'))
+        return [totals] if totals['entries'] else []
+    rows = cube.values(*group_by).annotate(
+        quantity=Sum('quantity'), entries=Sum('entries')
+    ).order_by(*group_by)
+
+    return [
+        {
+            **{dimension: row[columns[dimension]] for dimension in dimensions},
+            'quantity': row['quantity'],
+            'entries': row['entries'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,114 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from assets import alerts, analytics, reference, rollups
+from assets.ledger import bump_ledger_version, transactions_recorded
+from assets.models import (
+    Asset, Assignment, Base, EquipmentType, Expenditure, InTransitBalance,
+    Purchase, StockThreshold, TransactionLog, Transfer, TransferLog
+)
+
+
+@receiver(post_save, sender=Base)
+@receiver(post_delete, sender=Base)
+@receiver(post_save, sender=EquipmentType)
+@receiver(post_delete, sender=EquipmentType)
+def invalidate_reference_data(sender, **kwargs):
+    """Reload bases and equipment types in every worker once the change commits"""
+    transaction.on_commit(reference.invalidate)
+
+
+def affected_bases(instance):
+    """Base ids whose ledger a saved or deleted row belongs to"""
+    if isinstance(instance, Asset):
+        return [instance.base_id]
+    if isinstance(instance, Transfer):
+        return [instance.from_base_id, instance.to_base_id]
+    try:
+        return [instance.asset.base_id]
+    except Asset.DoesNotExist:
+        # Cascade delete of the asset itself; the global scope is still bumped
+        return []
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+@receiver(post_save, sender=Transfer)
+@receiver(post_delete, sender=Transfer)
+@receiver(post_save, sender=TransferLog)
+@receiver(post_delete, sender=TransferLog)
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_save, sender=Expenditure)
+@receiver(post_delete, sender=Expenditure)
+@receiver(post_delete, sender=TransactionLog)
+def invalidate_ledger_fragments(sender, instance, **kwargs):
+    """Expire cached ledger tables of the affected bases once the change commits"""
+    base_ids = affected_bases(instance)
+    transaction.on_commit(lambda: bump_ledger_version(*base_ids))
+
+
+@receiver(post_save, sender=TransactionLog)
+def announce_transaction(sender, instance, created, **kwargs):
+    """Single TransactionLog saves go through the same signal as bulk inserts"""
+    if created:
+        transactions_recorded.send(sender=TransactionLog, logs=[instance])
+
+
+@receiver(transactions_recorded)
+def invalidate_ledger_fragments_for_logs(sender, logs, **kwargs):
+    base_ids = {log.asset.base_id for log in logs}
+    transaction.on_commit(lambda: bump_ledger_version(*base_ids))
+
+
+@receiver(post_delete, sender=Transfer)
+def release_in_transit(sender, instance, **kwargs):
+    """A deleted IN_TRANSIT transfer leaves the pipeline without moving stock"""
+    if instance.status == 'IN_TRANSIT':
+        InTransitBalance.adjust(instance, -instance.quantity)
+
+
+@receiver(post_save, sender=Transfer)
+@receiver(post_delete, sender=Transfer)
+def invalidate_transfer_flows(sender, instance, **kwargs):
+    """Only transfers completed before today can change a closed flow window"""
+    if instance.completion_date and analytics.is_closed(analytics.local_day(instance.completion_date)):
+        transaction.on_commit(analytics.invalidate_closed_flows)
+
+
+@receiver(post_save, sender=StockThreshold)
+def evaluate_threshold_change(sender, instance, **kwargs):
+    """A new or changed minimum may raise or clear the alert of its asset"""
+    asset_ids = Asset.objects.filter(
+        base_id=instance.base_id, equipment_type_id=instance.equipment_type_id
+    ).values_list('id', flat=True)
+    alerts.schedule_evaluation(*asset_ids)
+
+
+@receiver(transactions_recorded)
+def roll_up_transactions(sender, logs, **kwargs):
+    rollups.apply_logs(logs)
+
+
+@receiver(post_delete, sender=TransactionLog)
+def roll_back_transaction(sender, instance, **kwargs):
+    try:
+        rollups.apply_logs([instance], sign=-1)
+    except Asset.DoesNotExist:
+        # The asset row is already gone; `rebuild_rollups` resynchronises the cube
+        pass
+
+
+@receiver(pre_delete, sender=Asset)
+def delete_transaction_logs(sender, instance, **kwargs):
+    """Cascade to the transaction log, which may live in the audit database"""
+    TransactionLog.objects.filter(asset_id=instance.pk).delete()
+
+
+@receiver(pre_delete, sender=User)
+def detach_transaction_logs(sender, instance, **kwargs):
+    TransactionLog.objects.filter(created_by_id=instance.pk).update(created_by=None)
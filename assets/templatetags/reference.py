@@ -0,0 +1,31 @@
+from django import template
+
+from assets import reference
+
+register = template.Library()
+
+
+@register.filter
+def base_name(base_id):
+    """{{ asset.base_id|base_name }}"""
+    return reference.base_name(base_id)
+
+
+@register.filter
+def equipment_name(equipment_type_id):
+    """{{ asset.equipment_type_id|equipment_name }}"""
+    return reference.equipment_type_name(equipment_type_id)
+
+
+@register.filter
+def equipment_category(equipment_type_id):
+    """{{ asset.equipment_type_id|equipment_category }} - display label of the category"""
+    equipment_type = reference.get_equipment_type(equipment_type_id)
+    return equipment_type.category_display if equipment_type else ''
+
+
+@register.filter
+def equipment_unit(equipment_type_id):
+    """{{ asset.equipment_type_id|equipment_unit }}"""
+    equipment_type = reference.get_equipment_type(equipment_type_id)
+    return equipment_type.unit_of_measure if equipment_type else ''
@@ -5,12 +5,15 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('purchases/', views.purchases, name='purchases'),
     path('purchases/<int:purchase_id>/approve/', views.approve_purchase, name='approve_purchase'),
+    path('purchases/approve-bulk/', views.approve_purchases_bulk, name='approve_purchases_bulk'),
     path('purchases/<int:purchase_id>/delete/', views.delete_purchase, name='delete_purchase'),
     path('transfers/', views.transfers, name='transfers'),
+    path('transfers/pipeline/', views.transfer_pipeline, name='transfer_pipeline'),
     path('transfers/<int:transfer_id>/approve/', views.approve_transfer, name='approve_transfer'),
     path('transfers/<int:transfer_id>/complete/', views.complete_transfer, name='complete_transfer'),
     path('transfers/<int:transfer_id>/delete/', views.delete_transfer, name='delete_transfer'),
     path('assignments/', views.assignments, name='assignments'),
+    path('assignments/return/', views.return_assignments, name='return_assignments'),
     path('assignments/<int:assignment_id>/return/', views.return_assignment, name='return_assignment'),
     path('assignments/<int:assignment_id>/delete/', views.delete_assignment, name='delete_assignment'),
     path('expenditures/', views.expenditures, name='expenditures'),
@@ -18,4 +21,15 @@ urlpatterns = [
     path('assets/<int:asset_id>/', views.asset_detail, name='asset_detail'),
     path('assets/<int:asset_id>/net-movement/', views.net_movement_detail, name='net_movement_detail'),
     path('transactions/', views.transaction_log, name='transaction_log'),
+    path('alerts/', views.stock_alerts, name='stock_alerts'),
+    path('reports/', views.reports, name='reports'),
+    path('reports/<str:period>/download/', views.report_download, name='report_download'),
+    path('api/alerts/', views.stock_alerts_api, name='stock_alerts_api'),
+    path('api/reports/<str:period>/', views.report_data, name='report_data'),
+    path('api/analytics/transfer-flows/', views.transfer_flows, name='transfer_flows'),
+    path('api/rollups/pivot/', views.rollup_pivot, name='rollup_pivot'),
+    path('api/transfers/pipeline/', views.transfer_pipeline_api, name='transfer_pipeline_api'),
+    path('api/personnel/holdings/', views.personnel_holdings, name='personnel_holdings'),
+    path('api/autocomplete/assets/', views.asset_autocomplete, name='asset_autocomplete'),
+    path('api/autocomplete/personnel/', views.personnel_autocomplete, name='personnel_autocomplete'),
 ]
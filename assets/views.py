@@ -1,21 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.models import User, Group
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
-from django.db.models import Q, Sum
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.core.paginator import Paginator
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
+import csv
 import json
 
 from assets.models import (
     Asset, Base, EquipmentType, Personnel, Purchase, Transfer, 
-    Assignment, Expenditure, TransactionLog, TransferLog
+    Assignment, ConsumptionForecast, Expenditure, InTransitBalance, InventoryReport,
+    InventoryReportLine, StockAlert, TransactionLog, TransferLog
 )
 from assets.forms import (
     PurchaseForm, TransferForm, AssignmentForm, ExpenditureForm, 
     DashboardFilterForm, ReturnAssignmentForm
 )
+from assets import rollups
+from assets.analytics import flow_matrix, is_closed
+from assets.ledger import ledger_cache_context
+from assets.listing import assignment_rows, expenditure_rows, purchase_rows, transfer_rows
+from assets.reference import base_name, equipment_type_name, get_reference_data
+from military_config.db import query_budget, write_transaction
+from military_config.routers import replica_reads
 
 
 def get_user_base(user):
@@ -65,6 +77,8 @@ def filter_assets_for_user(user, queryset):
 
 
 @login_required
+@replica_reads
+@query_budget(14)
 def dashboard(request):
     """Dashboard with key metrics and filters"""
     user_base = get_user_base(request.user)
@@ -91,16 +105,28 @@ def dashboard(request):
             assets = assets.filter(equipment_type=equipment_type)
     
     # Calculate metrics
-    total_opening_balance = assets.aggregate(total=Sum('opening_balance'))['total'] or 0
-    total_closing_balance = assets.aggregate(total=Sum('closing_balance'))['total'] or 0
-    total_assigned = assets.aggregate(total=Sum('assigned_count'))['total'] or 0
-    total_expended = assets.aggregate(total=Sum('expended_count'))['total'] or 0
+    totals = assets.aggregate(
+        opening=Sum('opening_balance'), closing=Sum('closing_balance'),
+        assigned=Sum('assigned_count'), expended=Sum('expended_count'),
+    )
+    total_opening_balance = totals['opening'] or 0
+    total_closing_balance = totals['closing'] or 0
+    total_assigned = totals['assigned'] or 0
+    total_expended = totals['expended'] or 0
     
     # Get recent transactions
-    recent_transactions = TransactionLog.objects.select_related('asset', 'created_by').all()[:10]
+    recent_transactions = TransactionLog.objects.prefetch_related('asset', 'created_by').all()[:10]
+    
+    # Expendable stock closest to running out
+    low_supply = ConsumptionForecast.objects.filter(
+        asset__in=assets.values('id'), days_of_supply__isnull=False
+    ).order_by('days_of_supply').values(
+        'asset_id', 'asset__base_id', 'asset__equipment_type_id', 'ewma_rate', 'days_of_supply', 'computed_at'
+    )[:10]
     
     context = {
-        'assets': assets,
+        'assets': assets.with_net_movement(),
+        'low_supply': low_supply,
         'filter_form': filter_form,
         'total_opening_balance': total_opening_balance,
         'total_closing_balance': total_closing_balance,
@@ -108,6 +134,7 @@ def dashboard(request):
         'total_expended': total_expended,
         'recent_transactions': recent_transactions,
         'user_base': user_base,
+        **ledger_cache_context(request.user, user_base),
     }
     
     return render(request, 'assets/dashboard.html', context)
@@ -115,6 +142,8 @@ def dashboard(request):
 
 @login_required
 @require_http_methods(["GET", "POST"])
+@write_transaction
+@query_budget(10)
 def purchases(request):
     """Purchase management"""
     user_base = get_user_base(request.user)
@@ -127,7 +156,7 @@ def purchases(request):
             
             # Check permissions
             if not request.user.is_superuser and not request.user.groups.filter(name='Logistics Officer').exists():
-                if user_base and purchase.asset.base != user_base:
+                if user_base and purchase.asset.base_id != user_base.id:
                     return JsonResponse({'error': 'Unauthorized'}, status=403)
             
             purchase.save()
@@ -136,7 +165,7 @@ def purchases(request):
         form = PurchaseForm()
     
     # Get purchases
-    purchases_list = Purchase.objects.select_related('asset', 'created_by', 'approved_by').all()
+    purchases_list = Purchase.objects.all()
     
     if not request.user.is_superuser and not request.user.groups.filter(name='Logistics Officer').exists():
         if user_base:
@@ -151,8 +180,9 @@ def purchases(request):
     
     context = {
         'form': form,
-        'purchases': purchases_list,
+        'purchases': purchase_rows(purchases_list),
         'user_base': user_base,
+        **ledger_cache_context(request.user, user_base),
     }
     
     return render(request, 'assets/purchases.html', context)
@@ -160,6 +190,7 @@ def purchases(request):
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def approve_purchase(request, purchase_id):
     """Approve a purchase"""
     if not request.user.is_superuser and not request.user.groups.filter(name='Admin').exists():
@@ -171,8 +202,42 @@ def approve_purchase(request, purchase_id):
     return JsonResponse({'status': 'success', 'message': 'Purchase approved'})
 
 
+@login_required
+@require_http_methods(["POST"])
+@write_transaction
+def approve_purchases_bulk(request):
+    """Approve every pending purchase matching the posted ids or filters"""
+    if not request.user.is_superuser and not request.user.groups.filter(name='Admin').exists():
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    purchases = Purchase.objects.filter(status='PENDING')
+    purchase_ids = request.POST.getlist('purchase_ids')
+    base_id = request.POST.get('base')
+    asset_id = request.POST.get('asset')
+    supplier = request.POST.get('supplier')
+    if not (purchase_ids or base_id or asset_id or supplier):
+        return JsonResponse({'error': 'Provide purchase_ids, base, asset or supplier'}, status=400)
+
+    try:
+        if purchase_ids:
+            purchases = purchases.filter(id__in=[int(pk) for pk in purchase_ids])
+        if base_id:
+            purchases = purchases.filter(asset__base_id=int(base_id))
+        if asset_id:
+            purchases = purchases.filter(asset_id=int(asset_id))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid id'}, status=400)
+    if supplier:
+        purchases = purchases.filter(supplier=supplier)
+
+    approved = purchases.approve(request.user)
+    return JsonResponse({'status': 'success', 'approved': approved})
+
+
 @login_required
 @require_http_methods(["GET", "POST"])
+@write_transaction
+@query_budget(10)
 def transfers(request):
     """Transfer management"""
     user_base = get_user_base(request.user)
@@ -188,7 +253,7 @@ def transfers(request):
                 # Base Commanders can only transfer FROM their base
                 if not request.user.groups.filter(name='Base Commander').exists():
                     return JsonResponse({'error': 'Unauthorized'}, status=403)
-                if user_base and transfer.from_base != user_base:
+                if user_base and transfer.from_base_id != user_base.id:
                     return JsonResponse({'error': 'Can only transfer from your base'}, status=403)
             
             transfer.save()
@@ -219,7 +284,7 @@ def transfers(request):
         form = TransferForm()
     
     # Get transfers
-    transfers_list = Transfer.objects.select_related('equipment_type', 'from_base', 'to_base').all()
+    transfers_list = Transfer.objects.all()
     
     if not request.user.is_superuser and not request.user.groups.filter(name='Logistics Officer').exists():
         if user_base:
@@ -236,8 +301,9 @@ def transfers(request):
     
     context = {
         'form': form,
-        'transfers': transfers_list,
+        'transfers': transfer_rows(transfers_list),
         'user_base': user_base,
+        **ledger_cache_context(request.user, user_base),
     }
     
     return render(request, 'assets/transfers.html', context)
@@ -249,6 +315,7 @@ def transfers(request):
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def approve_transfer(request, transfer_id):
     """Approve/Initiate a transfer from PENDING to IN_TRANSIT"""
     if not request.user.is_superuser:
@@ -256,9 +323,7 @@ def approve_transfer(request, transfer_id):
     
     transfer = get_object_or_404(Transfer, id=transfer_id)
     
-    if transfer.status == 'PENDING':
-        transfer.status = 'IN_TRANSIT'
-        transfer.save()
+    if transfer.dispatch():
         return JsonResponse({'status': 'success', 'message': 'Transfer initiated'})
     
     return JsonResponse({'error': 'Transfer cannot be approved'}, status=400)
@@ -266,6 +331,7 @@ def approve_transfer(request, transfer_id):
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def complete_transfer(request, transfer_id):
     """Complete a transfer"""
     if not request.user.is_superuser and not request.user.groups.filter(name='Admin').exists():
@@ -279,6 +345,8 @@ def complete_transfer(request, transfer_id):
 
 @login_required
 @require_http_methods(["GET", "POST"])
+@write_transaction
+@query_budget(10)
 def assignments(request):
     """Assignment management"""
     user_base = get_user_base(request.user)
@@ -291,7 +359,7 @@ def assignments(request):
             
             # Check permissions
             if not request.user.is_superuser:
-                if user_base and assignment.asset.base != user_base:
+                if user_base and assignment.asset.base_id != user_base.id:
                     return JsonResponse({'error': 'Unauthorized'}, status=403)
             
             assignment.save()
@@ -300,7 +368,7 @@ def assignments(request):
         form = AssignmentForm()
     
     # Get assignments
-    assignments_list = Assignment.objects.select_related('asset', 'personnel', 'assigned_by').all()
+    assignments_list = Assignment.objects.all()
     
     if not request.user.is_superuser:
         if user_base:
@@ -308,17 +376,55 @@ def assignments(request):
         else:
             assignments_list = assignments_list.none()
     
+    # Returns are chosen among the open assignments of one person (?personnel=<id>)
+    selected_personnel = return_form = None
+    if request.GET.get('personnel'):
+        selected_personnel = get_selected_personnel(request.user, user_base, request.GET['personnel'])
+        assignments_list = assignments_list.filter(personnel=selected_personnel)
+        return_form = ReturnAssignmentForm(personnel=selected_personnel)
+    
     context = {
         'form': form,
-        'assignments': assignments_list,
+        'assignments': assignment_rows(assignments_list),
         'user_base': user_base,
+        'selected_personnel': selected_personnel,
+        'return_form': return_form,
     }
     
     return render(request, 'assets/assignments.html', context)
 
 
+def get_selected_personnel(user, user_base, personnel_id):
+    """Personnel picked on the assignments page, limited to the user's base"""
+    personnel = Personnel.objects.select_related('user')
+    if not user.is_superuser:
+        personnel = personnel.filter(base=user_base) if user_base else personnel.none()
+    if not str(personnel_id).isdigit():
+        raise Http404('Invalid personnel')
+    return get_object_or_404(personnel, id=personnel_id)
+
+
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
+def return_assignments(request):
+    """Return one of the open assignments of the selected person"""
+    personnel = get_selected_personnel(request.user, get_user_base(request.user), request.POST.get('personnel', ''))
+    form = ReturnAssignmentForm(request.POST, personnel=personnel)
+    if form.is_valid():
+        assignment = form.cleaned_data['assignment']
+        if form.cleaned_data['notes']:
+            assignment.notes = f"{assignment.notes}\n{form.cleaned_data['notes']}".strip()
+        assignment.return_asset()
+        messages.success(request, f'Returned {assignment}')
+    else:
+        messages.error(request, 'Select one of the open assignments of this person')
+    return redirect(f"{reverse('assignments')}?personnel={personnel.id}")
+
+
+@login_required
+@require_http_methods(["POST"])
+@write_transaction
 def return_assignment(request, assignment_id):
     """Return an assignment"""
     assignment = get_object_or_404(Assignment, id=assignment_id)
@@ -332,6 +438,8 @@ def return_assignment(request, assignment_id):
 
 @login_required
 @require_http_methods(["GET", "POST"])
+@write_transaction
+@query_budget(10)
 def expenditures(request):
     """Expenditure management"""
     user_base = get_user_base(request.user)
@@ -344,7 +452,7 @@ def expenditures(request):
             
             # Check permissions
             if not request.user.is_superuser:
-                if user_base and expenditure.asset.base != user_base:
+                if user_base and expenditure.asset.base_id != user_base.id:
                     return JsonResponse({'error': 'Unauthorized'}, status=403)
             
             expenditure.save()
@@ -353,7 +461,7 @@ def expenditures(request):
         form = ExpenditureForm()
     
     # Get expenditures
-    expenditures_list = Expenditure.objects.select_related('asset', 'recorded_by').all()
+    expenditures_list = Expenditure.objects.all()
     
     if not request.user.is_superuser:
         if user_base:
@@ -363,7 +471,7 @@ def expenditures(request):
     
     context = {
         'form': form,
-        'expenditures': expenditures_list,
+        'expenditures': expenditure_rows(expenditures_list),
         'user_base': user_base,
     }
     
@@ -371,6 +479,8 @@ def expenditures(request):
 
 
 @login_required
+@replica_reads
+@query_budget(12)
 def asset_detail(request, asset_id):
     """Asset detail view with transaction history"""
     asset = get_object_or_404(Asset, id=asset_id)
@@ -381,12 +491,15 @@ def asset_detail(request, asset_id):
             return JsonResponse({'error': 'Unauthorized'}, status=403)
     
     # Get transaction history
-    transactions = TransactionLog.objects.filter(asset=asset).select_related('created_by')
+    transactions = TransactionLog.objects.filter(asset=asset).prefetch_related('created_by')
     
     # Calculate net movement breakdown
     purchases_total = asset.purchases.filter(status='APPROVED').aggregate(total=Sum('quantity'))['total'] or 0
-    transfers_in = asset.transfer_logs.filter(status='COMPLETED', transfer_type='IN').aggregate(total=Sum('quantity'))['total'] or 0
-    transfers_out = asset.transfer_logs.filter(status='COMPLETED', transfer_type='OUT').aggregate(total=Sum('quantity'))['total'] or 0
+    transfer_totals = dict(
+        asset.transfer_logs.filter(status='COMPLETED').values_list('transfer_type').annotate(total=Sum('quantity'))
+    )
+    transfers_in = transfer_totals.get('IN', 0)
+    transfers_out = transfer_totals.get('OUT', 0)
     
     context = {
         'asset': asset,
@@ -400,9 +513,11 @@ def asset_detail(request, asset_id):
 
 
 @login_required
+@replica_reads
+@query_budget(10)
 def transaction_log(request):
     """View audit log of all transactions"""
-    transactions = TransactionLog.objects.select_related('asset', 'created_by').all()
+    transactions = TransactionLog.objects.prefetch_related('asset', 'created_by').all()
     
     # Filter by transaction type
     transaction_type = request.GET.get('type')
@@ -424,7 +539,289 @@ def transaction_log(request):
     return render(request, 'assets/transaction_log.html', context)
 
 
+def in_transit_lanes(user):
+    """Open pipeline lanes visible to a user, read from the in-transit ledger"""
+    lanes = InTransitBalance.objects.filter(quantity__gt=0)
+    
+    if not user.is_superuser and not user.groups.filter(name='Logistics Officer').exists():
+        user_base = get_user_base(user)
+        if user_base:
+            lanes = lanes.filter(Q(from_base=user_base) | Q(to_base=user_base))
+        else:
+            lanes = lanes.none()
+    
+    return [
+        {
+            'from_base_id': from_base_id,
+            'from_base': base_name(from_base_id),
+            'to_base_id': to_base_id,
+            'to_base': base_name(to_base_id),
+            'equipment_type_id': equipment_type_id,
+            'equipment': equipment_type_name(equipment_type_id),
+            'quantity': quantity,
+            'updated_at': updated_at,
+        }
+        for from_base_id, to_base_id, equipment_type_id, quantity, updated_at in lanes.order_by(
+            'from_base_id', 'to_base_id', 'equipment_type_id'
+        ).values_list('from_base_id', 'to_base_id', 'equipment_type_id', 'quantity', 'updated_at')
+    ]
+
+
+@login_required
+@replica_reads
+@query_budget(6)
+def transfer_pipeline(request):
+    """Stock currently in transit between bases"""
+    lanes = in_transit_lanes(request.user)
+    context = {
+        'lanes': lanes,
+        'total_in_transit': sum(lane['quantity'] for lane in lanes),
+    }
+    return render(request, 'assets/pipeline.html', context)
+
+
+@login_required
+@replica_reads
+@query_budget(5)
+def transfer_pipeline_api(request):
+    """API endpoint for the in-transit pipeline"""
+    lanes = in_transit_lanes(request.user)
+    for lane in lanes:
+        lane['quantity'] = float(lane['quantity'])
+    return JsonResponse({'results': lanes})
+
+
+def active_alerts(user):
+    """Active low-stock alerts visible to a user, newest first"""
+    alerts = StockAlert.objects.filter(status='ACTIVE')
+    
+    if not user.is_superuser and not user.groups.filter(name='Logistics Officer').exists():
+        user_base = get_user_base(user)
+        if user_base:
+            alerts = alerts.filter(asset__base=user_base)
+        else:
+            alerts = alerts.none()
+    
+    return [
+        {
+            'id': alert_id,
+            'asset_id': asset_id,
+            'base': base_name(base_id),
+            'equipment': equipment_type_name(equipment_type_id),
+            'minimum': minimum,
+            'triggered_balance': triggered_balance,
+            'closing_balance': closing_balance,
+            'triggered_at': triggered_at,
+        }
+        for alert_id, asset_id, base_id, equipment_type_id, minimum, triggered_balance, closing_balance, triggered_at
+        in alerts.order_by('-triggered_at').values_list(
+            'id', 'asset_id', 'asset__base_id', 'asset__equipment_type_id', 'minimum',
+            'triggered_balance', 'asset__closing_balance', 'triggered_at',
+        )
+    ]
+
+
+@login_required
+@query_budget(6)
+def stock_alerts(request):
+    """Assets currently below their minimum stock"""
+    return render(request, 'assets/alerts.html', {'alerts': active_alerts(request.user)})
+
+
+@login_required
+@query_budget(5)
+def stock_alerts_api(request):
+    """API endpoint for the active low-stock alerts"""
+    alerts = active_alerts(request.user)
+    for alert in alerts:
+        for field in ('minimum', 'triggered_balance', 'closing_balance'):
+            alert[field] = float(alert[field])
+    return JsonResponse({'results': alerts})
+
+
+FLOW_WINDOW_DAYS = 30
+
+
+@login_required
+@replica_reads
+@query_budget(5)
+def transfer_flows(request):
+    """API endpoint for the origin x destination x category matrix of completed transfers"""
+    base_id = None
+    if not request.user.is_superuser and not request.user.groups.filter(name__in=['Admin', 'Logistics Officer']).exists():
+        user_base = get_user_base(request.user)
+        if not user_base:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+        base_id = user_base.id
+    
+    try:
+        end_date = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        start_date = (
+            date.fromisoformat(request.GET['start']) if request.GET.get('start')
+            else end_date - timedelta(days=FLOW_WINDOW_DAYS - 1)
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'error': 'start must not be after end'}, status=400)
+    
+    cells = flow_matrix(start_date, end_date, base_id)
+    for cell in cells:
+        cell['from_base'] = base_name(cell['from_base_id'])
+        cell['to_base'] = base_name(cell['to_base_id'])
+    
+    return JsonResponse({
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'closed': is_closed(end_date),
+        'categories': dict(EquipmentType.CATEGORY_CHOICES),
+        'cells': cells,
+    })
+
+
+REPORT_COLUMNS = (
+    'opening_balance', 'purchases', 'transfers_in', 'transfers_out',
+    'assigned', 'returned', 'expended', 'closing_balance',
+)
+
+
+def get_report(period):
+    """InventoryReport for a 'YYYY-MM' period, or 404"""
+    try:
+        period_start = date.fromisoformat(f'{period}-01')
+    except ValueError:
+        raise Http404('Invalid period')
+    return get_object_or_404(InventoryReport, period_start=period_start)
+
+
+def report_lines(user, report):
+    """Lines of a report visible to a user, with base and equipment names"""
+    lines = InventoryReportLine.objects.filter(report=report)
+    
+    if not user.is_superuser and not user.groups.filter(name='Logistics Officer').exists():
+        user_base = get_user_base(user)
+        if user_base:
+            lines = lines.filter(base=user_base)
+        else:
+            lines = lines.none()
+    
+    rows = []
+    for values in lines.values_list('base_id', 'equipment_type_id', *REPORT_COLUMNS):
+        base_id, equipment_type_id = values[:2]
+        rows.append({
+            'base': base_name(base_id),
+            'equipment': equipment_type_name(equipment_type_id),
+            **dict(zip(REPORT_COLUMNS, values[2:])),
+        })
+    rows.sort(key=lambda row: (row['base'], row['equipment']))
+    return rows
+
+
+@login_required
+@replica_reads
+@query_budget(10)
+def reports(request):
+    """Precomputed monthly inventory reports"""
+    periods = list(InventoryReport.objects.values_list('period_start', flat=True))
+    report = get_report(request.GET['period']) if request.GET.get('period') else InventoryReport.objects.first()
+    
+    context = {
+        'periods': periods,
+        'report': report,
+        'lines': report_lines(request.user, report) if report else [],
+    }
+    return render(request, 'assets/reports.html', context)
+
+
+@login_required
+@replica_reads
+@query_budget(8)
+def report_data(request, period):
+    """API endpoint for one monthly inventory report"""
+    report = get_report(period)
+    lines = report_lines(request.user, report)
+    for line in lines:
+        for column in REPORT_COLUMNS:
+            line[column] = float(line[column])
+    
+    return JsonResponse({
+        'period': report.period,
+        'period_start': report.period_start.isoformat(),
+        'period_end': report.period_end.isoformat(),
+        'generated_at': report.generated_at.isoformat(),
+        'lines': lines,
+    })
+
+
+@login_required
+@replica_reads
+@query_budget(8)
+def report_download(request, period):
+    """Download one monthly inventory report as CSV (default) or JSON"""
+    if request.GET.get('format') == 'json':
+        response = report_data(request, period)
+        response['Content-Disposition'] = f'attachment; filename="inventory-{period}.json"'
+        return response
+    
+    report = get_report(period)
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="inventory-{report.period}.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['base', 'equipment', *REPORT_COLUMNS])
+    for line in report_lines(request.user, report):
+        writer.writerow([line['base'], line['equipment'], *(line[column] for column in REPORT_COLUMNS)])
+    return response
+
+
+@login_required
+@replica_reads
+@query_budget(7)
+def rollup_pivot(request):
+    """API endpoint slicing the ledger rollup cube by any subset of its dimensions"""
+    base_id = None
+    if not request.user.is_superuser and not request.user.groups.filter(name__in=['Admin', 'Logistics Officer']).exists():
+        user_base = get_user_base(request.user)
+        if not user_base:
+            return JsonResponse({'error': 'Unauthorized'}, status=403)
+        base_id = user_base.id
+    
+    def listed(name):
+        return [value for value in request.GET.get(name, '').split(',') if value]
+    
+    dimensions = listed('dimensions') or list(rollups.DIMENSIONS)
+    granularity = request.GET.get('granularity', 'month')
+    if set(dimensions) - set(rollups.DIMENSIONS) or granularity not in rollups.GRANULARITIES:
+        return JsonResponse({
+            'error': 'Unknown dimension or granularity',
+            'dimensions': rollups.DIMENSIONS,
+            'granularities': list(rollups.GRANULARITIES),
+        }, status=400)
+    
+    try:
+        filters = {
+            'base': [int(pk) for pk in listed('base')],
+            'category': listed('category'),
+            'transaction_type': listed('transaction_type'),
+            'start': date.fromisoformat(f"{request.GET['start']}-01") if request.GET.get('start') else None,
+            'end': date.fromisoformat(f"{request.GET['end']}-01") if request.GET.get('end') else None,
+        }
+    except ValueError:
+        return JsonResponse({'error': 'Invalid filter; months are YYYY-MM'}, status=400)
+    
+    rows = rollups.pivot(dimensions, granularity, base_id, filters)
+    for row in rows:
+        row['quantity'] = float(row['quantity'] or 0)
+        if 'base' in row:
+            row['base_name'] = base_name(row['base'])
+        if 'period' in row:
+            row['period'] = row['period'].isoformat()
+    
+    return JsonResponse({'dimensions': dimensions, 'granularity': granularity, 'results': rows})
+
+
 @login_required
+@replica_reads
+@query_budget(9)
 def net_movement_detail(request, asset_id):
     """API endpoint for net movement details (popup)"""
     asset = get_object_or_404(Asset, id=asset_id)
@@ -434,24 +831,179 @@ def net_movement_detail(request, asset_id):
         if get_user_base(request.user) != asset.base:
             return JsonResponse({'error': 'Unauthorized'}, status=403)
     
-    purchases = asset.purchases.filter(status='APPROVED').values('id', 'quantity', 'supplier', 'purchase_date')
-    transfers_in = asset.transfer_logs.filter(status='COMPLETED', transfer_type='IN').values('id', 'quantity', 'created_at')
-    transfers_out = asset.transfer_logs.filter(status='COMPLETED', transfer_type='OUT').values('id', 'quantity', 'created_at')
+    purchases = list(asset.purchases.filter(status='APPROVED').values('id', 'quantity', 'supplier', 'purchase_date'))
+    transfers = asset.transfer_logs.filter(status='COMPLETED').values('id', 'quantity', 'created_at', 'transfer_type')
+    transfers_in, transfers_out = [], []
+    for transfer in transfers:
+        (transfers_in if transfer.pop('transfer_type') == 'IN' else transfers_out).append(transfer)
+    
+    # Same figure as Asset.calculate_net_movement, from the rows already loaded
+    net_movement = (
+        sum(row['quantity'] for row in purchases)
+        + sum(row['quantity'] for row in transfers_in)
+        - sum(row['quantity'] for row in transfers_out)
+    )
     
     data = {
         'asset': str(asset),
-        'purchases': list(purchases),
-        'transfers_in': list(transfers_in),
-        'transfers_out': list(transfers_out),
-        'net_movement': float(asset.calculate_net_movement()),
+        'purchases': purchases,
+        'transfers_in': transfers_in,
+        'transfers_out': transfers_out,
+        'net_movement': float(net_movement),
     }
     
     return JsonResponse(data)
 
 
+HOLDINGS_PAGE_SIZE = 50
+HOLDINGS_MAX_PAGE_SIZE = 200
+
+
+@login_required
+@replica_reads
+@query_budget(9)
+def personnel_holdings(request):
+    """API endpoint for the outstanding (unreturned) assignments of each person"""
+    holders = Personnel.objects.filter(
+        id__in=Assignment.objects.filter(return_date__isnull=True).values('personnel_id')
+    )
+    
+    if not request.user.is_superuser and not request.user.groups.filter(name='Logistics Officer').exists():
+        user_base = get_user_base(request.user)
+        if user_base:
+            holders = holders.filter(base=user_base)
+        else:
+            holders = holders.none()
+    
+    try:
+        if request.GET.get('personnel'):
+            holders = holders.filter(id=int(request.GET['personnel']))
+        per_page = min(int(request.GET.get('page_size', HOLDINGS_PAGE_SIZE)), HOLDINGS_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid parameter'}, status=400)
+    
+    holders = holders.order_by('service_number').values_list(
+        'id', 'service_number', 'rank', 'user__first_name', 'user__last_name', 'base_id'
+    )
+    page = Paginator(holders, max(per_page, 1)).get_page(request.GET.get('page'))
+    
+    people = {
+        personnel_id: {
+            'id': personnel_id,
+            'service_number': service_number,
+            'name': f'{first_name} {last_name}'.strip(),
+            'rank': rank,
+            'base_id': base_id,
+            'holdings': [],
+        }
+        for personnel_id, service_number, rank, first_name, last_name, base_id in page.object_list
+    }
+    
+    # One grouped query over the open-assignment index for the whole page
+    holdings = Assignment.objects.filter(
+        personnel_id__in=list(people), return_date__isnull=True
+    ).values('personnel_id', 'asset__equipment_type_id').annotate(
+        quantity=Sum('quantity'), assignments=Count('id')
+    ).order_by('personnel_id', 'asset__equipment_type_id')
+    
+    for row in holdings:
+        people[row['personnel_id']]['holdings'].append({
+            'equipment_type_id': row['asset__equipment_type_id'],
+            'equipment': equipment_type_name(row['asset__equipment_type_id']),
+            'quantity': float(row['quantity']),
+            'assignments': row['assignments'],
+        })
+    
+    return JsonResponse({
+        'count': page.paginator.count,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'results': list(people.values()),
+    })
+
+
+# Autocomplete Views
+AUTOCOMPLETE_LIMIT = 20
+
+
+def prefix_range(field, term):
+    """Prefix match expressed as a range so it can use a plain B-tree index"""
+    return Q(**{f'{field}__gte': term, f'{field}__lt': term + '\U0010ffff'})
+
+
+@login_required
+@query_budget(5)
+def asset_autocomplete(request):
+    """JSON options for asset selectors, scoped to the user's base"""
+    term = request.GET.get('q', '').strip()
+    assets = filter_assets_for_user(request.user, Asset.objects.all())
+    
+    # Equipment types and bases are matched in the reference-data cache, without
+    # a query; matching assets are then reached through the (equipment_type, base)
+    # unique index and the base index.
+    if term:
+        prefix = term.casefold()
+        data = get_reference_data()
+        equipment_type_ids = [
+            ref.id for ref in data.equipment_types.values() if ref.name.casefold().startswith(prefix)
+        ]
+        base_ids = [ref.id for ref in data.bases.values() if ref.name.casefold().startswith(prefix)]
+        assets = assets.filter(Q(equipment_type_id__in=equipment_type_ids) | Q(base_id__in=base_ids))
+    
+    # Ordered along the (equipment_type, base) unique index, without joining the
+    # named tables; the names come from the reference cache
+    rows = assets.order_by('equipment_type_id', 'base_id').values_list(
+        'id', 'equipment_type_id', 'base_id'
+    )[:AUTOCOMPLETE_LIMIT]
+    
+    results = sorted(
+        (
+            {'id': asset_id, 'text': f"{equipment_type_name(equipment_type_id)} at {base_name(base_id)}"}
+            for asset_id, equipment_type_id, base_id in rows
+        ),
+        key=lambda result: result['text'],
+    )
+    return JsonResponse({'results': results})
+
+
+@login_required
+@query_budget(5)
+def personnel_autocomplete(request):
+    """JSON options for personnel selectors, scoped to the user's base"""
+    term = request.GET.get('q', '').strip()
+    personnel = Personnel.objects.all()
+    
+    if not request.user.is_superuser and not request.user.groups.filter(name='Logistics Officer').exists():
+        user_base = get_user_base(request.user)
+        if user_base:
+            personnel = personnel.filter(base=user_base)
+        else:
+            personnel = personnel.none()
+    
+    # Service numbers and usernames are unique, hence indexed
+    if term:
+        personnel = personnel.filter(
+            prefix_range('service_number', term) | prefix_range('user__username', term)
+        )
+    
+    rows = personnel.order_by('service_number').values_list(
+        'id', 'user__first_name', 'user__last_name', 'user__username', 'rank', 'service_number'
+    )[:AUTOCOMPLETE_LIMIT]
+    
+    results = [
+        {
+            'id': personnel_id,
+            'text': f"{f'{first} {last}'.strip() or username} ({rank}) - {service_number}",
+        }
+        for personnel_id, first, last, username, rank, service_number in rows
+    ]
+    return JsonResponse({'results': results})
+
+
 # Delete Views
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def delete_purchase(request, purchase_id):
     """Delete a purchase"""
     purchase = get_object_or_404(Purchase, id=purchase_id)
@@ -466,6 +1018,7 @@ def delete_purchase(request, purchase_id):
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def delete_transfer(request, transfer_id):
     """Delete a transfer"""
     transfer = get_object_or_404(Transfer, id=transfer_id)
@@ -480,6 +1033,7 @@ def delete_transfer(request, transfer_id):
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def delete_assignment(request, assignment_id):
     """Delete an assignment"""
     assignment = get_object_or_404(Assignment, id=assignment_id)
@@ -494,6 +1048,7 @@ def delete_assignment(request, assignment_id):
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def delete_expenditure(request, expenditure_id):
     """Delete an expenditure"""
     expenditure = get_object_or_404(Expenditure, id=expenditure_id)
@@ -0,0 +1,141 @@
+"""
+Gunicorn configuration for the Military Asset Management System.
+
+Gunicorn picks this file up automatically when started from the project root.
+
+- Workers are gthread workers; their number follows the CPUs (and memory)
+  available to the container, and each runs GUNICORN_THREADS threads.
+- With GUNICORN_PRELOAD (the default) the master imports Django once and
+  workers share those pages copy-on-write instead of importing it again.
+- Workers are recycled after GUNICORN_MAX_REQUESTS requests, with jitter so
+  they do not all restart at once.
+- Each worker warms its caches (URL resolver, templates, reference data and,
+  with DB_POOL, the connection pool) before it accepts requests.
+
+Every value can be overridden on the command line or with GUNICORN_CMD_ARGS.
+"""
+import gc
+import glob
+import os
+
+# Imported as a module: a top-level name `config` would be read as gunicorn's --config setting
+import decouple
+
+# Shared directory for Prometheus multi-process metrics. Stale files from a
+# previous run are removed on start-up so counters begin from zero.
+prometheus_multiproc_dir = decouple.config('PROMETHEUS_MULTIPROC_DIR', default='')
+if prometheus_multiproc_dir:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = prometheus_multiproc_dir
+
+
+def available_cpus():
+    """CPUs this process may use: its affinity mask, capped by a cgroup CPU quota"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as handle:
+            quota, period = handle.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def available_memory_mb():
+    """Memory limit of the container (cgroup v2), else the machine's total, in MB"""
+    try:
+        with open('/sys/fs/cgroup/memory.max') as handle:
+            limit = handle.read().strip()
+        if limit != 'max':
+            return int(limit) // (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def autotune_workers():
+    """One worker per CPU plus a spare (at least two, so a recycled worker never leaves none)"""
+    workers = max(2, available_cpus() + 1)
+    memory = available_memory_mb()
+    if memory:
+        # Keep a quarter of the memory for the master, the database and the page cache
+        per_worker = decouple.config('GUNICORN_WORKER_MEMORY_MB', default=80, cast=int)
+        workers = min(workers, max(1, memory * 3 // 4 // per_worker))
+    return workers
+
+
+def autotune_threads():
+    """Threads per worker; a worker never runs more threads than its connection pool can serve"""
+    threads = decouple.config('GUNICORN_THREADS', default=4, cast=int)
+    if decouple.config('DB_ENGINE', default='sqlite') == 'postgresql' and decouple.config('DB_POOL', default=False, cast=bool):
+        threads = min(threads, decouple.config('DB_POOL_MAX_SIZE', default=4, cast=int))
+    return threads
+
+
+wsgi_app = 'military_config.wsgi:application'
+bind = [f"0.0.0.0:{os.environ['PORT']}"] if 'PORT' in os.environ else ['127.0.0.1:8000']
+
+worker_class = decouple.config('GUNICORN_WORKER_CLASS', default='gthread')
+workers = decouple.config('WEB_CONCURRENCY', default=autotune_workers(), cast=int)
+threads = autotune_threads()
+preload_app = decouple.config('GUNICORN_PRELOAD', default=True, cast=bool)
+
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = decouple.config('GUNICORN_MAX_REQUESTS_JITTER', default=max_requests // 10, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = 30
+keepalive = 5
+
+# Heartbeat files on tmpfs: a slow disk cannot make the master kill healthy workers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = decouple.config('GUNICORN_ACCESS_LOG', default=None)
+errorlog = '-'
+
+
+def on_starting(server):
+    if prometheus_multiproc_dir:
+        os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(prometheus_multiproc_dir, '*.db')):
+            os.remove(path)
+
+
+def when_ready(server):
+    server.log.info(
+        'Serving with %d %s workers x %d threads (preload %s)',
+        server.cfg.workers, server.cfg.worker_class_str, server.cfg.threads, 'on' if server.cfg.preload_app else 'off',
+    )
+    if server.cfg.preload_app:
+        from military_config.warmup import warm_shared
+
+        # Build what every worker would otherwise build alone, then move it out
+        # of the collector's reach so collections in workers do not write to
+        # (and so copy) the shared pages
+        warm_shared()
+        gc.collect()
+        gc.freeze()
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        # A connection opened while the app loaded must not be shared by workers
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    from military_config.warmup import warm_shared, warm_worker
+
+    warm_shared()
+    warm_worker()
+
+
+def child_exit(server, worker):
+    if prometheus_multiproc_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,21 @@
+"""
+Cache backends.
+"""
+from django.core.cache.backends.locmem import LocMemCache
+
+_missing = object()
+
+
+class FragmentCache(LocMemCache):
+    """
+    LocMemCache holding the {% cache %} template fragments, counting its
+    hits and misses in mams_cache_requests_total (cache="fragments").
+    """
+
+    def get(self, key, default=None, version=None):
+        # Imported here: prometheus_client is only loaded once something is counted
+        from tracking.metrics import record_cache_lookup
+
+        value = super().get(key, _missing, version)
+        record_cache_lookup('fragments', value is not _missing)
+        return default if value is _missing else value
@@ -0,0 +1,103 @@
+"""Database helpers shared by the views"""
+import functools
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+from military_config.routers import AUDIT, PRIMARY, audit_configured
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'could not obtain lock', 'deadlock detected')
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return any(error in message for error in LOCK_ERRORS)
+
+
+@contextmanager
+def ledger_atomic(using=None):
+    """
+    transaction.atomic() for writes that record TransactionLog rows.
+
+    When the log lives in the audit database, a transaction is opened there
+    too, nested inside the primary's, so a write that rolls back (or is
+    retried after a lock error) leaves no log rows behind. The two commit one
+    after the other, the audit database first; they are not a single atomic
+    commit.
+    """
+    with transaction.atomic(using=using):
+        if (using or PRIMARY) == PRIMARY and audit_configured():
+            with transaction.atomic(using=AUDIT):
+                yield
+        else:
+            yield
+
+
+def retry_on_lock(func, label, using=None):
+    """
+    Call func in a transaction (see ledger_atomic), retrying when it fails on
+    lock contention.
+
+    A locked attempt is rolled back entirely and retried after an exponential
+    backoff with jitter, up to DB_WRITE_RETRIES attempts in total. Returns
+    func's result and the number of retries it took.
+    """
+    attempts = max(settings.DB_WRITE_RETRIES, 1)
+    for attempt in range(attempts):
+        try:
+            with ledger_atomic(using=using):
+                return func(), attempt
+        except OperationalError as exc:
+            if not is_lock_error(exc) or attempt == attempts - 1:
+                raise
+            delay = settings.DB_WRITE_RETRY_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.warning('%s locked (attempt %d/%d), retrying in %.3fs', label, attempt + 1, attempts, delay)
+            time.sleep(delay)
+
+
+def write_transaction(view_func):
+    """
+    Run unsafe requests of a view in one transaction, retried on lock contention.
+
+    With the SQLite production profile the transaction starts with BEGIN
+    IMMEDIATE, so contention surfaces when the transaction starts rather than
+    half-way through the view. Safe requests run without a transaction.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return view_func(request, *args, **kwargs)
+        response, _ = retry_on_lock(lambda: view_func(request, *args, **kwargs), request.path)
+        return response
+    return wrapper
+
+
+def query_budget(max_queries):
+    """
+    Declare the most queries a view may run per request.
+
+    QueryBudgetMiddleware warns about views over budget when DEBUG is on, and
+    the view tests assert every budget with seeded data at two sizes.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def duplicated_queries(statements):
+    """(count, sql) of statements executed more than once, most repeated first"""
+    counts = Counter(statements)
+    return [(count, sql) for sql, count in counts.most_common() if count > 1]
+
+
+def format_duplicates(statements):
+    return ''.join(f'\n  {count}x {sql}' for count, sql in duplicated_queries(statements))
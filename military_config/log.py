@@ -0,0 +1,22 @@
+"""
+Logging handlers.
+"""
+import logging.handlers
+import os
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that opens its file (creating the directory) on the
+    first record instead of when logging is configured.
+
+    Importing settings then touches no files, and with gunicorn's preload_app
+    the master does not hand an open log file to every forked worker.
+    """
+
+    def __init__(self, filename, *args, delay=True, **kwargs):
+        super().__init__(filename, *args, delay=delay, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
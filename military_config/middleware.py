@@ -1,7 +1,17 @@
 import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
 
+from military_config import routers
+from military_config.db import format_duplicates
+
 audit_logger = logging.getLogger('audit')
+logger = logging.getLogger(__name__)
 
 
 class AuditLogMiddleware(MiddlewareMixin):
@@ -36,3 +46,125 @@ class AuditLogMiddleware(MiddlewareMixin):
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
+
+
+class MetricsMiddleware:
+    """Record request count, latency and DB query count per URL name (and tell the slow-query log the view)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Imported here: prometheus_client is only loaded once something is counted
+        from tracking import metrics, slowqueries
+
+        query_count = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            query_count[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        token = slowqueries.current_request.set(request)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count_queries))
+                response = self.get_response(request)
+        finally:
+            slowqueries.current_request.reset(token)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        metrics.REQUEST_COUNT.labels(view=view, method=request.method, status=response.status_code).inc()
+        metrics.REQUEST_LATENCY.labels(view=view).observe(duration)
+        metrics.DB_QUERY_COUNT.labels(view=view).inc(query_count[0])
+        metrics.DB_QUERIES_PER_REQUEST.labels(view=view).observe(query_count[0])
+        metrics.record_pool_stats()
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    Warn when a view runs more queries than its @query_budget (DEBUG only).
+
+    The warning lists the statements executed more than once, which is where
+    an N+1 loop shows up. Every response carries an X-Query-Count header.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(len(statements))
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and len(statements) > budget:
+            logger.warning(
+                '%s ran %d queries, over its budget of %d%s',
+                request.path, len(statements), budget, format_duplicates(statements),
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
+
+
+class ProfilerMiddleware:
+    """Profile a superuser's request on demand (see tracking/profiling.py)"""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from tracking import profiling
+
+        if profiling.requested(request):
+            return profiling.profile_request(self.get_response, request)
+        return self.get_response(request)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pin requests to the primary database during and shortly after a write.
+
+    Unsafe requests are pinned and set a short-lived cookie; requests that
+    carry the cookie stay on the primary until it expires, so views reading
+    from the replica never hide a user's own changes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+        token = routers.pin_to_primary(writes or routers.PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.unpin(token)
+
+        if writes and routers.replica_configured():
+            response.set_cookie(
+                routers.PIN_COOKIE, '1',
+                max_age=settings.READ_YOUR_WRITES_SECONDS,
+                httponly=True,
+                samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
@@ -0,0 +1,90 @@
+"""
+Database routing: primary, read replica and audit database.
+
+* Writes always go to 'default' (the primary).
+* Reads go to 'default' unless the view opted into replica reads with
+  @replica_reads and a 'replica' alias is configured. A request that writes
+  (any non-safe method) and the requests that follow it for
+  READ_YOUR_WRITES_SECONDS are pinned to the primary, so users always see
+  their own changes despite replication lag.
+* TransactionLog reads and writes go to 'audit' when that alias is
+  configured. Its foreign keys carry no database constraint, and joins to
+  it are replaced by prefetches so nothing needs both databases at once.
+
+Every model gets an explicit alias: left to Django, related rows fetched
+through an audit row would otherwise be read from the audit database.
+"""
+import contextvars
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+AUDIT = 'audit'
+PIN_COOKIE = 'db_primary_pin'
+
+# Whether the current request reads from the replica; off by default
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+# Whether the current request must read its own writes from the primary
+_pinned = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+def is_audit_model(model):
+    return model._meta.label_lower == 'assets.transactionlog'
+
+
+def audit_configured():
+    return AUDIT in settings.DATABASES
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if is_audit_model(model) and audit_configured():
+            return AUDIT
+        if _use_replica.get() and not _pinned.get() and replica_configured():
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        if is_audit_model(model) and audit_configured():
+            return AUDIT
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA:
+            # The replica receives its schema through replication
+            return False
+        if db == AUDIT:
+            return app_label == 'assets' and model_name == 'transactionlog'
+        if model_name == 'transactionlog' and audit_configured():
+            return False
+        return None
+
+
+def pin_to_primary(pinned):
+    """Set whether the current request reads from the primary only; returns a reset token"""
+    return _pinned.set(pinned)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+def replica_reads(view_func):
+    """Let a read-heavy view query the replica (unless the request is pinned)"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _use_replica.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
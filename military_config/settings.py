@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,9 +40,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'rest_framework',
-    'corsheaders',
-    'django_filters',
     'assets',
     'accounts',
     'tracking',
@@ -49,12 +47,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'military_config.middleware.MetricsMiddleware',
+    'military_config.middleware.QueryBudgetMiddleware',
+    'military_config.middleware.ReadYourWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'military_config.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'military_config.middleware.AuditLogMiddleware',
@@ -66,13 +67,19 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compiled templates are kept in memory for the life of the worker
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -83,6 +90,26 @@ WSGI_APPLICATION = 'military_config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Production profile for SQLite at small deployments (SQLITE_PRODUCTION=True): WAL
+# journaling so readers never block the writer, pragmas applied as each connection
+# opens, write transactions that take the lock up front (BEGIN IMMEDIATE), a busy
+# timeout instead of immediate "database is locked" errors and persistent connections
+SQLITE_PRODUCTION_PROFILE = {
+    'CONN_MAX_AGE': config('SQLITE_CONN_MAX_AGE', default=600, cast=int),
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': config('SQLITE_BUSY_TIMEOUT', default=5, cast=int),
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA temp_store=MEMORY;'
+            'PRAGMA cache_size=-20000;'
+            'PRAGMA mmap_size=134217728;'
+        ),
+    },
+}
+
 if config('DB_ENGINE', default='sqlite') == 'postgresql':
     DATABASES = {
         'default': {
@@ -92,8 +119,35 @@ if config('DB_ENGINE', default='sqlite') == 'postgresql':
             'PASSWORD': config('DB_PASSWORD'),
             'HOST': config('DB_HOST'),
             'PORT': config('DB_PORT', default='5432'),
+            # Keep connections open between requests, checked before reuse
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
+    # psycopg 3 connection pool, one per worker process (replaces persistent connections)
+    if config('DB_POOL', default=False, cast=bool):
+        DATABASES['default'].update({
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    'max_size': config('DB_POOL_MAX_SIZE', default=4, cast=int),
+                    'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+                },
+            },
+        })
+    if config('DB_REPLICA_HOST', default=''):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': config('DB_REPLICA_HOST'),
+            'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        }
+    if config('DB_AUDIT_NAME', default=''):
+        DATABASES['audit'] = {
+            **DATABASES['default'],
+            'NAME': config('DB_AUDIT_NAME'),
+            'HOST': config('DB_AUDIT_HOST', default=DATABASES['default']['HOST']),
+        }
 else:
     DATABASES = {
         'default': {
@@ -101,6 +155,61 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    # Locally, point DB_REPLICA_NAME at a copy (or at db.sqlite3 itself) to exercise routing
+    if config('DB_REPLICA_NAME', default=''):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / config('DB_REPLICA_NAME'),
+        }
+    if config('DB_AUDIT_NAME', default=''):
+        DATABASES['audit'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / config('DB_AUDIT_NAME'),
+        }
+    if config('SQLITE_PRODUCTION', default=False, cast=bool):
+        for alias in DATABASES.values():
+            alias.update(SQLITE_PRODUCTION_PROFILE)
+
+if 'replica' in DATABASES:
+    # Tests read the replica through the default test database
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# Writes go to the primary, read-heavy views to the replica and the
+# transaction log to the audit database (see military_config/routers.py)
+DATABASE_ROUTERS = ['military_config.routers.PrimaryReplicaRouter']
+
+# Seconds a user's reads stay on the primary after a write
+READ_YOUR_WRITES_SECONDS = config('READ_YOUR_WRITES_SECONDS', default=5, cast=int)
+
+# Attempts of a write view that failed on lock contention, and the first backoff delay
+DB_WRITE_RETRIES = config('DB_WRITE_RETRIES', default=3, cast=int)
+DB_WRITE_RETRY_DELAY = config('DB_WRITE_RETRY_DELAY', default=0.05, cast=float)
+
+
+# Caches
+# 'default' is private to each worker process; 'shared' lives on disk so that
+# version tokens (e.g. for the reference-data cache) are seen by every worker.
+
+CACHES = {
+    # {% cache %} fragments; lookups are counted in mams_cache_requests_total
+    'default': {
+        'BACKEND': 'military_config.cache.FragmentCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        # Outside the source tree by default; point it at a persistent directory in production
+        'LOCATION': config('SHARED_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'mams-cache')),
+    },
+}
+
+# Lifetime of cached ledger table fragments; they are also keyed on the ledger version
+LEDGER_FRAGMENT_TIMEOUT = config('LEDGER_FRAGMENT_TIMEOUT', default=600, cast=int)
+
+# Seconds between checks of the shared reference-data version (bases, equipment types)
+REFERENCE_CACHE_CHECK_INTERVAL = config('REFERENCE_CACHE_CHECK_INTERVAL', default=1.0, cast=float)
+
+# Lifetime of cached transfer flow matrices for windows that ended before today
+TRANSFER_FLOWS_CACHE_TIMEOUT = config('TRANSFER_FLOWS_CACHE_TIMEOUT', default=86400, cast=int)
 
 
 # Password validation
@@ -139,7 +248,22 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+
+# collectstatic fingerprints every file (css/app.<hash>.css) and writes gzip and
+# Brotli copies beside it. WhiteNoise serves the smallest encoding the browser
+# accepts, and fingerprinted files as immutable, so repeat visits never ask again.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Tests render pages without running collectstatic (see military_config/testing.py)
+TEST_RUNNER = 'military_config.testing.TestRunner'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -149,7 +273,14 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# REST Framework configuration
+# Optional apps below are installed only when enabled, so that start-up (every
+# management command, every restarted worker) does not import them.
+
+# REST Framework configuration. No view uses it yet: REST_API=True installs it
+REST_API = config('REST_API', default=False, cast=bool)
+if REST_API:
+    INSTALLED_APPS += ['rest_framework', 'django_filters']
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -162,8 +293,35 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 50,
 }
 
-# CORS configuration
+# CORS configuration, for a frontend served from another origin
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000', cast=Csv())
+if CORS_ALLOWED_ORIGINS:
+    INSTALLED_APPS += ['corsheaders']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+        'corsheaders.middleware.CorsMiddleware',
+    )
+
+# Prometheus metrics
+# Point PROMETHEUS_MULTIPROC_DIR at a directory shared by all gunicorn workers
+# (e.g. /tmp/mams-metrics) so /metrics aggregates samples from every worker.
+PROMETHEUS_MULTIPROC_DIR = config('PROMETHEUS_MULTIPROC_DIR', default='')
+if PROMETHEUS_MULTIPROC_DIR:
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', PROMETHEUS_MULTIPROC_DIR)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+
+# Statements slower than this are stored with their EXPLAIN plan (tracking/slowqueries.py).
+# Off by default: every connection would otherwise time each statement and, on
+# SQLite, the background writes compete for the write lock. Enable it per deployment.
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default=False, cast=bool)
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=200, cast=float)
+
+# Let superusers profile a request with ?_profile=1 or an X-Profile header
+REQUEST_PROFILING = config('REQUEST_PROFILING', default=True, cast=bool)
+
+# Admin changelists of tables larger than this show an estimated row count
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000, cast=int)
 
 # Login URL
 LOGIN_URL = 'login'
@@ -211,7 +369,7 @@ LOGGING = {
         },
         'file': {
             'level': 'INFO',
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'military_config.log.RotatingFileHandler',
             'filename': BASE_DIR / 'logs' / 'django.log',
             'maxBytes': 1024 * 1024 * 15,  # 15MB
             'backupCount': 10,
@@ -219,12 +377,20 @@ LOGGING = {
         },
         'audit_file': {
             'level': 'INFO',
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'military_config.log.RotatingFileHandler',
             'filename': BASE_DIR / 'logs' / 'audit.log',
             'maxBytes': 1024 * 1024 * 15,  # 15MB
             'backupCount': 10,
             'formatter': 'verbose',
         },
+        'slow_query_file': {
+            'level': 'INFO',
+            'class': 'military_config.log.RotatingFileHandler',
+            'filename': BASE_DIR / 'logs' / 'slow_queries.log',
+            'maxBytes': 1024 * 1024 * 15,  # 15MB
+            'backupCount': 5,
+            'formatter': 'verbose',
+        },
     },
     'loggers': {
         'django': {
@@ -237,8 +403,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'slow_queries': {
+            'handlers': ['slow_query_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
-
-# Create logs directory if it doesn't exist
-os.makedirs(BASE_DIR / 'logs', exist_ok=True)
@@ -0,0 +1,27 @@
+"""
+Test runner.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner serving static files unhashed.
+
+    The manifest storage needs the manifest written by collectstatic to
+    resolve {% static %} when DEBUG is off, as it is in tests.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.static_storage = override_settings(STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        })
+        self.static_storage.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.static_storage.disable()
+        super().teardown_test_environment(**kwargs)
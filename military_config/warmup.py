@@ -0,0 +1,61 @@
+"""
+Cache warm-up for gunicorn workers.
+
+warm_shared() builds the process-wide structures every first request would
+otherwise pay for: the URL resolver and the compiled page templates. Under
+preload_app it runs once in the master, before the fork, so the workers
+share the result. warm_worker() then fills what is per process: the reference
+data snapshot and, with DB_POOL, the connection pool.
+"""
+import logging
+import time
+
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = [
+    'base.html',
+    'accounts/login.html',
+    'assets/dashboard.html',
+    'assets/purchases.html',
+    'assets/transfers.html',
+    'assets/assignments.html',
+    'assets/expenditures.html',
+    'assets/transaction_log.html',
+    'assets/asset_detail.html',
+]
+
+_shared_warmed = False
+
+
+def warm_shared():
+    global _shared_warmed
+    if _shared_warmed:
+        return
+    start = time.perf_counter()
+    resolver = get_resolver()
+    resolver.reverse_dict  # populates the reverse lookup tables
+    for name in TEMPLATES:
+        get_template(name)
+    _shared_warmed = True
+    logger.info('Warmed URL resolver and %d templates in %.0f ms',
+                len(TEMPLATES), (time.perf_counter() - start) * 1000)
+
+
+def warm_worker():
+    from assets.reference import get_reference_data
+
+    start = time.perf_counter()
+    try:
+        get_reference_data(force_check=True)
+    except Exception:
+        # A worker that cannot reach the database still serves; its first request retries
+        logger.exception('Could not warm the reference data cache')
+    finally:
+        # Connections are per thread: hand this one back (to the pool, if any)
+        # rather than keep it open in a thread that serves no requests
+        connections.close_all()
+    logger.info('Warmed worker caches in %.0f ms', (time.perf_counter() - start) * 1000)
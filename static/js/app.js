@@ -0,0 +1,104 @@
+// Behaviour shared by every page that extends base.html. Page markup calls the
+// action functions below from onclick attributes.
+
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+function postAction(url, message, failure) {
+    if (confirm(message)) {
+        fetch(url, { method: 'POST', headers: {'X-CSRFToken': getCookie('csrftoken')} })
+            .then(() => location.reload())
+            .catch(e => alert(failure));
+    }
+}
+
+function approvePurchase(id) {
+    postAction(`/purchases/${id}/approve/`, 'Approve this purchase?', 'Error approving purchase');
+}
+
+function approveTransfer(id) {
+    postAction(`/transfers/${id}/approve/`, 'Initiate this transfer?', 'Error approving transfer');
+}
+
+function completeTransfer(id) {
+    postAction(`/transfers/${id}/complete/`, 'Mark this transfer as completed?', 'Error completing transfer');
+}
+
+function returnAsset(id) {
+    postAction(`/assignments/${id}/return/`, 'Mark this asset as returned?', 'Error returning asset');
+}
+
+// Dashboard: net movement of an asset, shown in #movementModal
+function loadMovement(assetId) {
+    fetch(`/assets/${assetId}/net-movement/`)
+        .then(response => response.json())
+        .then(data => {
+            let html = `<div class="mb-3"><strong>${data.asset}</strong></div>`;
+            html += `<div class="alert alert-info">Net Movement: <strong>${data.net_movement}</strong></div>`;
+            html += `<h6>Purchases: ${data.purchases.length}</h6>`;
+            html += `<ul class="small">`;
+            data.purchases.forEach(p => {
+                html += `<li>${p.quantity} units from ${p.supplier}</li>`;
+            });
+            html += `</ul>`;
+            html += `<h6>Transfers In: ${data.transfers_in.length}</h6>`;
+            html += `<h6>Transfers Out: ${data.transfers_out.length}</h6>`;
+            document.getElementById('movementContent').innerHTML = html;
+        })
+        .catch(error => console.error('Error:', error));
+}
+
+// Delete forms sit inside a cached fragment, so their CSRF token is filled in per page view
+document.querySelectorAll('input.csrf-token').forEach(input => {
+    input.value = getCookie('csrftoken');
+});
+
+// Populate <select data-autocomplete-url> lazily from the JSON autocomplete endpoints
+document.querySelectorAll('select[data-autocomplete-url]').forEach(function (select) {
+    const search = document.createElement('input');
+    search.type = 'search';
+    search.className = 'form-control mb-1';
+    search.placeholder = 'Type to search...';
+    select.parentNode.insertBefore(search, select);
+
+    let timer = null;
+    let loaded = false;
+
+    function load(term) {
+        fetch(`${select.dataset.autocompleteUrl}?q=${encodeURIComponent(term)}`)
+            .then(response => response.json())
+            .then(data => {
+                const current = select.value;
+                const keep = Array.from(select.options).filter(o => o.value === '' || o.value === current);
+                select.innerHTML = '';
+                keep.forEach(o => select.add(o));
+                data.results.forEach(item => {
+                    if (String(item.id) !== current) {
+                        select.add(new Option(item.text, item.id));
+                    }
+                });
+                loaded = true;
+            })
+            .catch(error => console.error('Error:', error));
+    }
+
+    search.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => load(search.value.trim()), 250);
+    });
+    [search, select].forEach(el => el.addEventListener('focus', () => {
+        if (!loaded) load('');
+    }));
+});
@@ -1,3 +1,121 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
 
-# Register your models here.
+from tracking.models import RequestProfile, SlowQuery
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'query_count', 'user', 'profiler', 'download_link')
+    list_select_related = ('user',)
+    list_filter = ('profiler', 'method', 'status_code')
+    date_hierarchy = 'created_at'
+    search_fields = ('path', 'view_name')
+    fieldsets = (
+        ('Request', {
+            'fields': ('created_at', 'user', 'method', 'path', 'view_name', 'status_code')
+        }),
+        ('Timing', {
+            'fields': ('duration_ms', 'query_count', 'query_time_ms', 'profiler', 'download_link')
+        }),
+        ('Profile', {
+            'fields': ('summary_display',)
+        }),
+        ('SQL', {
+            'fields': ('sql_display',),
+            'classes': ('collapse',)
+        }),
+        ('Templates', {
+            'fields': ('template_display',),
+            'classes': ('collapse',)
+        }),
+    )
+    readonly_fields = (
+        'created_at', 'user', 'method', 'path', 'view_name', 'status_code', 'duration_ms',
+        'query_count', 'query_time_ms', 'profiler', 'download_link', 'summary_display',
+        'sql_display', 'template_display',
+    )
+    
+    def get_queryset(self, request):
+        # The changelist never needs the profile itself
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('summary', 'data', 'sql_trace', 'template_timings')
+        return queryset
+    
+    def get_urls(self):
+        return [
+            path(
+                '<int:profile_id>/download/',
+                self.admin_site.admin_view(self.download),
+                name='tracking_requestprofile_download',
+            ),
+        ] + super().get_urls()
+    
+    def download(self, request, profile_id):
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        if not self.has_view_permission(request, profile):
+            return HttpResponse(status=403)
+        content_type = 'text/html' if profile.profiler == 'pyinstrument' else 'application/octet-stream'
+        response = HttpResponse(bytes(profile.data), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{profile.filename}"'
+        return response
+    
+    def download_link(self, obj):
+        return format_html('<a href="{}">Download</a>', reverse('admin:tracking_requestprofile_download', args=[obj.pk]))
+    download_link.short_description = 'Profile'
+    
+    def summary_display(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.summary)
+    summary_display.short_description = 'Summary'
+    
+    def sql_display(self, obj):
+        return format_html_join(
+            '\n', '<pre style="white-space: pre-wrap;">{:.2f} ms [{}] {}\n{}</pre>',
+            ((statement['ms'], statement['alias'], statement['sql'], statement['params']) for statement in obj.sql_trace),
+        )
+    sql_display.short_description = 'Statements'
+    
+    def template_display(self, obj):
+        return format_html(
+            '<pre>{}</pre>',
+            '\n'.join(
+                f"{timing['ms']:8.2f} ms {timing['renders']:5d}x  {timing['template']}" for timing in obj.template_timings
+            ),
+        )
+    template_display.short_description = 'Render times (inclusive)'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'duration_ms', 'view_name', 'origin', 'fingerprint', 'alias')
+    list_filter = ('alias',)
+    date_hierarchy = 'created_at'
+    search_fields = ('fingerprint', 'view_name', 'origin', 'sql')
+    fields = (
+        'created_at', 'duration_ms', 'alias', 'view_name', 'origin', 'fingerprint',
+        'params_hash', 'sql_display', 'plan_display',
+    )
+    readonly_fields = fields
+    
+    def sql_display(self, obj):
+        return format_html('<pre style="white-space: pre-wrap;">{}</pre>', obj.sql)
+    sql_display.short_description = 'SQL'
+    
+    def plan_display(self, obj):
+        return format_html('<pre>{}</pre>', obj.plan)
+    plan_display.short_description = 'Plan'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracking.startup import PHASES, import_profile, measure
+
+
+class Command(BaseCommand):
+    help = 'Time django.setup() and the first request in a fresh interpreter, with import costs per module'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--phase', choices=[*PHASES, 'both'], default='both')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per phase (the median is shown)')
+        parser.add_argument('--top', type=int, default=15, help='Packages and modules listed per phase')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        phases = list(PHASES) if options['phase'] == 'both' else [options['phase']]
+        results = {}
+        for phase in phases:
+            try:
+                timing = measure(phase, options['repeat'])
+                modules, packages, loaded = import_profile(phase)
+            except RuntimeError as exc:
+                raise CommandError(exc)
+            results[phase] = {
+                **timing,
+                'modules': len(loaded),
+                'import_ms': sum(own for _, own, _ in modules) / 1000,
+                'packages': {name: own / 1000 for name, own in sorted(packages.items(), key=lambda item: -item[1])},
+                'slowest_modules': [
+                    {'module': name, 'self_ms': own / 1000, 'cumulative_ms': cumulative / 1000}
+                    for name, own, cumulative in sorted(modules, key=lambda module: -module[1])[:options['top']]
+                ],
+            }
+            self.report(phase, results[phase], options['top'])
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"Results written to {options['json_path']}")
+
+    def report(self, phase, result, top):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{phase}: {result['seconds'] * 1000:.0f} ms in process, {result['wall_seconds'] * 1000:.0f} ms "
+            f"with interpreter start-up; {result['modules']} modules, {result['import_ms']:.0f} ms importing"
+        ))
+        self.stdout.write('  by package (self time)')
+        for name, ms in list(result['packages'].items())[:top]:
+            self.stdout.write(f'    {name:<28} {ms:7.1f} ms')
+        self.stdout.write('  slowest modules (self / cumulative)')
+        for module in result['slowest_modules']:
+            self.stdout.write(
+                f"    {module['module']:<44} {module['self_ms']:7.1f} / {module['cumulative_ms']:7.1f} ms"
+            )
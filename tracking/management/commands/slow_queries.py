@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max, Sum
+from django.utils import timezone
+
+from tracking.models import SlowQuery
+from tracking.slowqueries import fingerprint
+
+
+class Command(BaseCommand):
+    help = 'Report slow queries grouped by SQL fingerprint, heaviest total time first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Captures of the last N days')
+        parser.add_argument('--limit', type=int, default=20, help='Fingerprints to show')
+        parser.add_argument('--origin', default='', help='Only captures whose origin contains this, e.g. assets/views.py')
+        parser.add_argument('--prune', type=int, metavar='DAYS', help='Delete captures older than DAYS instead')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['prune'] is not None:
+            deleted, _ = SlowQuery.objects.filter(created_at__lt=now - timedelta(days=options['prune'])).delete()
+            self.stdout.write(self.style.SUCCESS(f'✓ Deleted {deleted} slow query capture(s)'))
+            return
+
+        captures = SlowQuery.objects.filter(created_at__gte=now - timedelta(days=options['days']))
+        if options['origin']:
+            captures = captures.filter(origin__contains=options['origin'])
+
+        groups = captures.values('fingerprint').annotate(
+            count=Count('id'), total=Sum('duration_ms'), average=Avg('duration_ms'), slowest=Max('duration_ms'),
+            sql=Max('sql'), origin=Max('origin'),
+        ).order_by('-total')[:options['limit']]
+
+        views = {}
+        for row in captures.filter(fingerprint__in=[group['fingerprint'] for group in groups]).values(
+            'fingerprint', 'view_name'
+        ).annotate(count=Count('id')).order_by('-count'):
+            views.setdefault(row['fingerprint'], []).append(f"{row['view_name'] or '-'} ({row['count']})")
+
+        self.stdout.write(f"{'fingerprint':<18}{'count':>7}{'total ms':>12}{'avg ms':>10}{'max ms':>10}")
+        for group in groups:
+            self.stdout.write(
+                f"{group['fingerprint']:<18}{group['count']:>7}{group['total']:>12.0f}"
+                f"{group['average']:>10.1f}{group['slowest']:>10.1f}"
+            )
+            self.stdout.write(f"    origin: {group['origin'] or '-'}")
+            self.stdout.write(f"    views:  {', '.join(views.get(group['fingerprint'], []))}")
+            self.stdout.write(f"    sql:    {fingerprint(group['sql'])[0][:300]}")
@@ -0,0 +1,225 @@
+"""
+Prometheus metrics for the Military Asset Management System.
+
+When PROMETHEUS_MULTIPROC_DIR is set (see settings.py) every gunicorn worker
+writes its samples to a shared directory and the /metrics view aggregates
+them, so counters and histograms add up across workers without a push
+gateway or any other external service.
+"""
+import os
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST,
+    REGISTRY, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+NAMESPACE = 'mams'
+
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'HTTP requests by URL name, method and status code',
+    ['view', 'method', 'status'],
+    namespace=NAMESPACE,
+)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by URL name',
+    ['view'],
+    namespace=NAMESPACE,
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+DB_QUERY_COUNT = Counter(
+    'db_queries_total',
+    'Database queries executed while serving requests, by URL name',
+    ['view'],
+    namespace=NAMESPACE,
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    'db_queries_per_request',
+    'Number of database queries per request, by URL name',
+    ['view'],
+    namespace=NAMESPACE,
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250, 500, 1000),
+)
+
+LEDGER_WRITES = Counter(
+    'ledger_writes_total',
+    'TransactionLog rows written, by transaction type',
+    ['transaction_type'],
+    namespace=NAMESPACE,
+)
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Application cache lookups by cache name and result (hit/miss)',
+    ['cache', 'result'],
+    namespace=NAMESPACE,
+)
+
+# Connection pool gauges are summed over live workers: each worker has its own pool
+DB_POOL_SIZE = Gauge(
+    'db_pool_size',
+    'Configured connection pool bounds (min/max), by database alias',
+    ['alias', 'bound'],
+    namespace=NAMESPACE,
+    multiprocess_mode='livesum',
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    'db_pool_connections',
+    'Connections held by the pool, by database alias and state (idle/in_use)',
+    ['alias', 'state'],
+    namespace=NAMESPACE,
+    multiprocess_mode='livesum',
+)
+
+DB_POOL_WAITING = Gauge(
+    'db_pool_requests_waiting',
+    'Requests waiting for a pooled connection, by database alias',
+    ['alias'],
+    namespace=NAMESPACE,
+    multiprocess_mode='livesum',
+)
+
+DB_POOL_REQUESTS = Counter(
+    'db_pool_requests_total',
+    'Connections handed out by the pool, by database alias',
+    ['alias'],
+    namespace=NAMESPACE,
+)
+
+DB_POOL_WAIT = Counter(
+    'db_pool_wait_seconds_total',
+    'Time requests spent waiting for a pooled connection, by database alias',
+    ['alias'],
+    namespace=NAMESPACE,
+)
+
+DB_POOL_OPENED = Counter(
+    'db_pool_connections_opened_total',
+    'Server connections opened by the pool, by database alias',
+    ['alias'],
+    namespace=NAMESPACE,
+)
+
+
+def record_cache_lookup(cache_name, hit):
+    """Count a lookup against one of the application caches"""
+    CACHE_REQUESTS.labels(cache=cache_name, result='hit' if hit else 'miss').inc()
+
+
+def record_ledger_write(transaction_type, count=1):
+    """Count TransactionLog rows written"""
+    LEDGER_WRITES.labels(transaction_type=transaction_type).inc(count)
+
+
+def record_pool_stats():
+    """Publish the statistics of this worker's psycopg connection pools"""
+    from django.db import connections
+
+    for alias in connections:
+        connection = connections[alias]
+        if connection.vendor != 'postgresql' or not connection.settings_dict['OPTIONS'].get('pool'):
+            continue
+        pool = connection.pool
+        if pool is None:
+            continue
+        stats = pool.pop_stats()
+        DB_POOL_SIZE.labels(alias=alias, bound='min').set(stats.get('pool_min', 0))
+        DB_POOL_SIZE.labels(alias=alias, bound='max').set(stats.get('pool_max', 0))
+        DB_POOL_CONNECTIONS.labels(alias=alias, state='idle').set(stats.get('pool_available', 0))
+        DB_POOL_CONNECTIONS.labels(alias=alias, state='in_use').set(
+            stats.get('pool_size', 0) - stats.get('pool_available', 0)
+        )
+        DB_POOL_WAITING.labels(alias=alias).set(stats.get('requests_waiting', 0))
+        DB_POOL_REQUESTS.labels(alias=alias).inc(stats.get('requests_num', 0))
+        DB_POOL_WAIT.labels(alias=alias).inc(stats.get('requests_wait_ms', 0) / 1000)
+        DB_POOL_OPENED.labels(alias=alias).inc(stats.get('connections_num', 0))
+
+
+class InventoryCollector:
+    """
+    Gauges computed at scrape time.
+
+    Workflow backlogs are read from the database when /metrics is scraped
+    rather than tracked per worker, so they are always exact. Cache hit
+    ratios are derived from the aggregated cache counters.
+    """
+
+    def __init__(self, source_registry):
+        self.source_registry = source_registry
+
+    def collect(self):
+        from assets.models import Purchase, Transfer
+
+        pending = GaugeMetricFamily(
+            f'{NAMESPACE}_pending_purchases',
+            'Purchases awaiting approval',
+        )
+        pending.add_metric([], Purchase.objects.filter(status='PENDING').count())
+        yield pending
+
+        in_transit = GaugeMetricFamily(
+            f'{NAMESPACE}_transfers_in_transit',
+            'Transfers currently in transit between bases',
+        )
+        in_transit.add_metric([], Transfer.objects.filter(status='IN_TRANSIT').count())
+        yield in_transit
+
+        yield self._cache_hit_ratio()
+
+    def _cache_hit_ratio(self):
+        totals = {}
+        for family in self.source_registry.collect():
+            if family.name != f'{NAMESPACE}_cache_requests':
+                continue
+            for sample in family.samples:
+                if not sample.name.endswith('_total'):
+                    continue
+                hits, lookups = totals.get(sample.labels['cache'], (0.0, 0.0))
+                if sample.labels['result'] == 'hit':
+                    hits += sample.value
+                totals[sample.labels['cache']] = (hits, lookups + sample.value)
+
+        ratio = GaugeMetricFamily(
+            f'{NAMESPACE}_cache_hit_ratio',
+            'Share of application cache lookups served from cache',
+            labels=['cache'],
+        )
+        for cache_name, (hits, lookups) in sorted(totals.items()):
+            ratio.add_metric([cache_name], hits / lookups if lookups else 0.0)
+        return ratio
+
+
+def build_registry():
+    """Registry to expose on /metrics, aggregating all workers when possible"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        source = CollectorRegistry()
+        multiprocess.MultiProcessCollector(source)
+    else:
+        source = REGISTRY
+
+    registry = CollectorRegistry()
+    registry.register(_RegistryProxy(source))
+    registry.register(InventoryCollector(source))
+    return registry
+
+
+class _RegistryProxy:
+    """Re-export every metric family of another registry"""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def collect(self):
+        return self.registry.collect()
+
+
+def render_metrics():
+    """Return (payload, content_type) in the Prometheus text format"""
+    return generate_latest(build_registry()), CONTENT_TYPE_LATEST
+
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('alias', models.CharField(max_length=50)),
+                ('view_name', models.CharField(blank=True, max_length=200)),
+                ('fingerprint', models.CharField(db_index=True, max_length=16)),
+                ('sql', models.TextField()),
+                ('params_hash', models.CharField(max_length=16)),
+                ('duration_ms', models.FloatField()),
+                ('origin', models.CharField(blank=True, max_length=500)),
+                ('plan', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Slow queries',
+                'db_table': 'slow_queries',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,3 +1,60 @@
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+
+class RequestProfile(models.Model):
+    """A request profiled on demand by a superuser (see tracking/profiling.py)"""
+    PROFILERS = (
+        ('cprofile', 'cProfile'),
+        ('pyinstrument', 'pyinstrument'),
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='request_profiles')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    query_time_ms = models.FloatField(default=0)
+    profiler = models.CharField(max_length=20, choices=PROFILERS)
+
+    # Top functions as text, and the raw profile (pstats data or pyinstrument HTML)
+    summary = models.TextField(blank=True)
+    data = models.BinaryField()
+    sql_trace = models.JSONField(default=list)
+    template_timings = models.JSONField(default=list)
+
+    class Meta:
+        db_table = 'request_profiles'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    @property
+    def filename(self):
+        extension = 'html' if self.profiler == 'pyinstrument' else 'prof'
+        return f"profile-{self.pk}.{extension}"
+
+
+class SlowQuery(models.Model):
+    """A statement that ran longer than SLOW_QUERY_THRESHOLD_MS (see tracking/slowqueries.py)"""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    alias = models.CharField(max_length=50)
+    view_name = models.CharField(max_length=200, blank=True)
+    fingerprint = models.CharField(max_length=16, db_index=True)
+    sql = models.TextField()
+    params_hash = models.CharField(max_length=16)
+    duration_ms = models.FloatField()
+    origin = models.CharField(max_length=500, blank=True)
+    plan = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'slow_queries'
+        ordering = ['-created_at']
+        verbose_name_plural = 'Slow queries'
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms {self.origin or self.view_name}"
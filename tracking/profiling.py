@@ -0,0 +1,163 @@
+"""
+On-demand request profiling for superusers.
+
+A superuser adds ?_profile=1 to a URL (or sends an X-Profile header) and the
+request runs under pyinstrument's sampling profiler when it is installed,
+cProfile otherwise. The profile is stored as a RequestProfile together with
+the SQL statements the request ran and the render time of each template,
+and the response carries its id in X-Profile-Id. Profiles are listed and
+downloaded in the admin.
+
+Other requests only pay for a substring test on the query string and a
+header lookup; the profilers are imported and the template timer installed on
+the first profiled request.
+"""
+import contextvars
+import io
+import threading
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.template import base as template_base
+
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+SUMMARY_LINES = 60
+MAX_PARAMS_LENGTH = 500
+
+_template_timings = contextvars.ContextVar('template_timings', default=None)
+_timer_lock = threading.Lock()
+_timer_installed = False
+
+
+def requested(request):
+    """Whether a superuser asked for this request to be profiled"""
+    if QUERY_PARAM not in request.META.get('QUERY_STRING', '') and HEADER not in request.META:
+        return False
+    if QUERY_PARAM not in request.GET and HEADER not in request.META:
+        return False
+    return request.user.is_superuser
+
+
+def sampling_profiler():
+    """pyinstrument's Profiler class, or None when it is not installed"""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    return Profiler
+
+
+def install_template_timer():
+    """Wrap Template.render to time renders made while a profile is recording"""
+    global _timer_installed
+    with _timer_lock:
+        if _timer_installed:
+            return
+        render = template_base.Template.render
+
+        def timed_render(self, context):
+            timings = _template_timings.get()
+            if timings is None:
+                return render(self, context)
+            start = time.perf_counter()
+            try:
+                return render(self, context)
+            finally:
+                timings.append({'template': self.name or '<string>', 'ms': (time.perf_counter() - start) * 1000})
+
+        template_base.Template.render = timed_render
+        _timer_installed = True
+
+
+def aggregate_timings(timings):
+    """Render count and total time per template, slowest first"""
+    totals = {}
+    for timing in timings:
+        renders, ms = totals.get(timing['template'], (0, 0.0))
+        totals[timing['template']] = (renders + 1, ms + timing['ms'])
+    return [
+        {'template': template, 'renders': renders, 'ms': ms}
+        for template, (renders, ms) in sorted(totals.items(), key=lambda item: -item[1][1])
+    ]
+
+
+def profile_request(get_response, request):
+    """Serve a request under the profiler and store the result"""
+    import cProfile
+    import marshal
+    import pstats
+
+    from tracking.models import RequestProfile
+
+    SamplingProfiler = sampling_profiler()
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            statements.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': repr(params)[:MAX_PARAMS_LENGTH],
+                'ms': (time.perf_counter() - start) * 1000,
+            })
+
+    install_template_timer()
+    timings = []
+    token = _template_timings.set(timings)
+    profiler = SamplingProfiler() if SamplingProfiler else cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            if SamplingProfiler:
+                profiler.start()
+            else:
+                profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                if SamplingProfiler:
+                    profiler.stop()
+                else:
+                    profiler.disable()
+    finally:
+        _template_timings.reset(token)
+    duration = (time.perf_counter() - start) * 1000
+
+    if SamplingProfiler:
+        kind = 'pyinstrument'
+        summary = profiler.output_text(unicode=False, color=False)
+        data = profiler.output_html().encode()
+    else:
+        kind = 'cprofile'
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        summary = stream.getvalue()
+        # The format written by pstats.Stats.dump_stats, readable by snakeviz and pstats
+        profiler.create_stats()
+        data = marshal.dumps(profiler.stats)
+
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile.objects.create(
+        user=request.user,
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        view_name=match.view_name if match else '',
+        status_code=response.status_code,
+        duration_ms=duration,
+        query_count=len(statements),
+        query_time_ms=sum(statement['ms'] for statement in statements),
+        profiler=kind,
+        summary=summary,
+        data=data,
+        sql_trace=statements,
+        template_timings=aggregate_timings(timings),
+    )
+    response['X-Profile-Id'] = str(profile.pk)
+    return response
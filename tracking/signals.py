@@ -0,0 +1,28 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from assets.ledger import transactions_recorded
+from tracking import slowqueries
+
+
+@receiver(transactions_recorded)
+def count_ledger_writes(sender, logs, **kwargs):
+    """Feed the ledger write-rate counter"""
+    # Imported here: prometheus_client is only loaded once something is counted
+    from tracking.metrics import record_ledger_write
+
+    for transaction_type, count in Counter(log.transaction_type for log in logs).items():
+        record_ledger_write(transaction_type, count)
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    """Time every statement of new connections (see tracking/slowqueries.py)"""
+    # The background thread could not see (or would lock) an in-memory database, as in tests
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        return
+    if settings.SLOW_QUERY_LOG:
+        slowqueries.install(connection)
@@ -0,0 +1,153 @@
+"""
+Slow-query log.
+
+An execute wrapper installed on every database connection times each
+statement. Statements slower than SLOW_QUERY_THRESHOLD_MS are handed, with
+the view being served, a hash of their parameters and the innermost project
+frames that issued them, to a background thread. The thread runs EXPLAIN
+(EXPLAIN QUERY PLAN on SQLite) for SELECT statements and stores a SlowQuery
+row, also writing it to the 'slow_queries' logger (a rotating file). The
+request never waits for the plan.
+
+SQL is fingerprinted after replacing literals and collapsing IN lists, so
+`python manage.py slow_queries` can group the captures by statement.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger('slow_queries')
+
+MAX_PENDING = 1000
+
+# The request being served, set by MetricsMiddleware
+current_request = contextvars.ContextVar('current_request', default=None)
+
+_local = threading.local()
+_queue = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    """(normalized SQL, 16-character hash) identifying a statement regardless of its values"""
+    normalized = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    normalized = re.sub(r'\b\d+(?:\.\d+)?\b', '?', normalized)
+    normalized = normalized.replace('%s', '?')
+    normalized = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?+)', normalized)
+    normalized = ' '.join(normalized.split())
+    return normalized, hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def query_origin(depth=3):
+    """'path:line in function' of the innermost project frames on the stack, innermost first"""
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        if (frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+                and frame.filename != __file__):
+            frames.append(f'{os.path.relpath(frame.filename, base_dir)}:{frame.lineno} in {frame.name}')
+            if len(frames) == depth:
+                break
+    return ' < '.join(frames)
+
+
+def record_slow_queries(execute, sql, params, many, context):
+    """Execute wrapper timing every statement of a connection"""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - start) * 1000
+        if duration >= settings.SLOW_QUERY_THRESHOLD_MS and not getattr(_local, 'explaining', False):
+            capture(context['connection'].alias, sql, params, many, duration)
+
+
+def install(connection):
+    """Add the wrapper to a connection once; first, so execute_wrapper() blocks still pop their own"""
+    if record_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_slow_queries)
+
+
+def capture(alias, sql, params, many, duration):
+    request = current_request.get()
+    match = getattr(request, 'resolver_match', None) if request is not None else None
+    item = {
+        'alias': alias,
+        'sql': sql,
+        'params': None if many or params is None else tuple(params),
+        'params_hash': hashlib.sha1(repr(params).encode()).hexdigest()[:16],
+        'duration_ms': duration,
+        'view_name': match.view_name if match else '',
+        'origin': query_origin(),
+    }
+    try:
+        _pending().put_nowait(item)
+    except queue.Full:
+        logger.warning('Slow query dropped, %d captures pending: %s', MAX_PENDING, sql)
+
+
+def _pending():
+    """Queue of captures, with its worker thread started in this process"""
+    global _queue, _worker_pid
+    if _worker_pid != os.getpid():
+        with _worker_lock:
+            if _worker_pid != os.getpid():
+                _queue = queue.Queue(maxsize=MAX_PENDING)
+                threading.Thread(target=_explain_captures, args=(_queue,), name='slow-query-log', daemon=True).start()
+                _worker_pid = os.getpid()
+    return _queue
+
+
+def _explain_captures(pending):
+    _local.explaining = True
+    while True:
+        item = pending.get()
+        try:
+            store(item)
+        except Exception:
+            logger.exception('Could not record a slow query')
+        finally:
+            close_old_connections()
+
+
+def explain(alias, sql, params):
+    if params is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def store(item):
+    from tracking.models import SlowQuery
+
+    try:
+        plan = explain(item['alias'], item['sql'], item['params'])
+    except Exception as exc:
+        plan = f'EXPLAIN failed: {exc}'
+    _, digest = fingerprint(item['sql'])
+    SlowQuery.objects.create(
+        alias=item['alias'],
+        view_name=item['view_name'],
+        fingerprint=digest,
+        sql=item['sql'],
+        params_hash=item['params_hash'],
+        duration_ms=item['duration_ms'],
+        origin=item['origin'][:500],
+        plan=plan,
+    )
+    logger.warning(
+        '%.1f ms %s %s [%s] %s\n%s',
+        item['duration_ms'], digest, item['view_name'] or '-', item['origin'] or '-', item['sql'], plan,
+    )
@@ -0,0 +1,117 @@
+"""
+Start-up profiling.
+
+Each phase runs in a fresh interpreter, so nothing is already imported:
+- 'setup': django.setup(), the cost every management command pays first;
+- 'request': setup, then loading the WSGI application and serving its first
+  request (the login page), as a gunicorn worker does after a restart.
+
+measure() times a phase over several runs. import_profile() runs it once under
+`python -X importtime` and parses the per-module report. That report leaves out
+the modules Django loads with importlib.import_module (apps, models,
+middleware) though not what they import in turn; the names of all loaded
+modules come from sys.modules instead. loaded_modules() lists them after
+each stage of a phase: setup, then (for 'request') the application loaded,
+then its first request served.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+PHASES = ('setup', 'request')
+
+SCRIPT = '''
+import io, json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+import django
+django.setup()
+timings = {{'setup': time.perf_counter() - start}}
+stages = {{'setup': sorted(sys.modules)}}
+if {phase!r} == 'request':
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    stages['application'] = sorted(sys.modules)
+    environ = {{
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': '/accounts/login/', 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }}
+    statuses = []
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(response)
+    response.close()
+    timings['request'] = time.perf_counter() - start
+    timings['status'] = statuses[0]
+    stages['request'] = sorted(sys.modules)
+timings['loaded'] = sorted(sys.modules)
+timings['stages'] = stages
+print(json.dumps(timings))
+'''
+
+
+def run_phase(phase, importtime=False, env=None):
+    """(timings printed by the child, its stderr, wall time including interpreter start-up)"""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', SCRIPT.format(settings_module=os.environ['DJANGO_SETTINGS_MODULE'], phase=phase)]
+    start = time.perf_counter()
+    result = subprocess.run(
+        command, cwd=settings.BASE_DIR, env={**os.environ, **(env or {})},
+        capture_output=True, text=True, timeout=120,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f'{phase} phase failed:\n{result.stderr[-2000:]}')
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, result.stderr, wall
+
+
+def measure(phase, repeat=5):
+    """Median in-process and wall time of a phase, in seconds"""
+    runs = [run_phase(phase) for _ in range(repeat)]
+    return {
+        'seconds': statistics.median(timings[phase] for timings, _, _ in runs),
+        'wall_seconds': statistics.median(wall for _, _, wall in runs),
+    }
+
+
+def parse_importtime(stderr):
+    """[(module, self µs, cumulative µs)] from `python -X importtime` output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(own), int(cumulative)))
+    return modules
+
+
+def import_profile(phase, env=None):
+    """
+    (import times per module, self time per top-level package in µs, names of
+    every module loaded) for a phase
+    """
+    timings, stderr, _ = run_phase(phase, importtime=True, env=env)
+    modules = parse_importtime(stderr)
+    packages = defaultdict(int)
+    for name, own, _ in modules:
+        packages[name.split('.', 1)[0]] += own
+    return modules, dict(packages), timings['loaded']
+
+
+def loaded_modules(phase, env=None):
+    """{stage: set of module names in sys.modules once the stage is done} for a phase"""
+    timings, _, _ = run_phase(phase, env=env)
+    if phase == 'request' and not timings['status'].startswith('200'):
+        raise RuntimeError(f"The first request answered {timings['status']}")
+    return {stage: set(modules) for stage, modules in timings['stages'].items()}
@@ -1,3 +1,326 @@
-from django.test import TestCase
+import marshal
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.template import engines
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from prometheus_client.parser import text_string_to_metric_families
+
+from tracking import metrics, slowqueries
+from tracking.models import RequestProfile, SlowQuery
+from tracking.startup import loaded_modules
+
+
+class StartupImportTests(SimpleTestCase):
+    """What a fresh worker imports before and after serving its first request"""
+
+    # Optional subsystems, imported only once enabled or used
+    LAZY_MODULES = [
+        'rest_framework', 'django_filters', 'corsheaders',  # REST_API, CORS_ALLOWED_ORIGINS
+        'prometheus_client',  # on the first metric recorded
+        'numpy',  # consumption forecasts
+        'cProfile', 'pstats', 'pyinstrument',  # profiled requests
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Pin the settings that install optional apps, whatever the developer's environment says
+        cls.stages = loaded_modules('request', env={
+            'DB_ENGINE': 'sqlite', 'REST_API': 'False', 'CORS_ALLOWED_ORIGINS': '',
+        })
+
+    def assertNotLoaded(self, stage, modules):
+        for module in modules:
+            with self.subTest(stage=stage, module=module):
+                self.assertFalse(module in self.stages[stage], f'{module} is loaded after {stage}')
+
+    def test_setup_loads_no_optional_subsystem(self):
+        self.assertNotLoaded('setup', self.LAZY_MODULES)
+
+    def test_loading_the_application_loads_no_optional_subsystem(self):
+        # Instantiating the middleware must not import what it uses per request
+        self.assertNotLoaded('application', self.LAZY_MODULES)
+
+    def test_first_request_loads_only_the_metrics(self):
+        self.assertIn('prometheus_client', self.stages['request'])
+        self.assertNotLoaded('request', [module for module in self.LAZY_MODULES if module != 'prometheus_client'])
+
+
+class SlowQueryFingerprintTests(SimpleTestCase):
+    def test_values_do_not_change_the_fingerprint(self):
+        first = slowqueries.fingerprint("SELECT * FROM assets WHERE id = 12 AND name = 'Rifle'")
+        second = slowqueries.fingerprint("SELECT *  FROM assets\nWHERE id = 7 AND name = 'O''Brien'")
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], 'SELECT * FROM assets WHERE id = ? AND name = ?')
+
+    def test_in_lists_collapse_whatever_their_length(self):
+        normalized, digest = slowqueries.fingerprint('SELECT * FROM assets WHERE id IN (%s, %s, %s)')
+        self.assertEqual(normalized, 'SELECT * FROM assets WHERE id IN (?+)')
+        self.assertEqual(digest, slowqueries.fingerprint('SELECT * FROM assets WHERE id IN (1, 2)')[1])
+        self.assertEqual(len(digest), 16)
+
+    def test_different_statements_differ(self):
+        self.assertNotEqual(
+            slowqueries.fingerprint('SELECT * FROM assets WHERE id = 1')[1],
+            slowqueries.fingerprint('SELECT * FROM bases WHERE id = 1')[1],
+        )
+
+
+class SlowQueryCaptureTests(TestCase):
+    """Statements over the threshold are handed to the background thread with their context"""
+
+    def setUp(self):
+        self.pending = queue.Queue()
+        patcher = mock.patch.object(slowqueries, '_pending', return_value=self.pending)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_query(self):
+        with connection.execute_wrapper(slowqueries.record_slow_queries):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT id FROM slow_queries WHERE id = %s', [42])
+
+    def captured(self):
+        return [self.pending.get_nowait() for _ in range(self.pending.qsize())]
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_statement_over_threshold_is_captured(self):
+        request = SimpleNamespace(resolver_match=SimpleNamespace(view_name='assets:dashboard'))
+        token = slowqueries.current_request.set(request)
+        try:
+            self.run_query()
+        finally:
+            slowqueries.current_request.reset(token)
+
+        [item] = self.captured()
+        self.assertEqual(item['alias'], 'default')
+        self.assertEqual(item['sql'], 'SELECT id FROM slow_queries WHERE id = %s')
+        self.assertEqual(item['params'], (42,))
+        self.assertEqual(item['view_name'], 'assets:dashboard')
+        self.assertIn('tracking/tests.py', item['origin'])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=60000)
+    def test_statement_under_threshold_is_not_captured(self):
+        self.run_query()
+        self.assertEqual(self.captured(), [])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_explain_statements_are_not_captured(self):
+        # The background thread's own EXPLAIN must not capture itself
+        slowqueries._local.explaining = True
+        self.addCleanup(delattr, slowqueries._local, 'explaining')
+        self.run_query()
+        self.assertEqual(self.captured(), [])
+
+
+class SlowQueryStoreTests(TestCase):
+    def item(self, sql, params):
+        return {
+            'alias': 'default', 'sql': sql, 'params': params, 'params_hash': 'abc',
+            'duration_ms': 250.0, 'view_name': 'assets:purchases', 'origin': 'assets/views.py:10 in purchases',
+        }
+
+    def test_select_is_stored_with_its_plan(self):
+        sql = 'SELECT id FROM slow_queries WHERE fingerprint = %s'
+        with self.assertLogs('slow_queries', 'WARNING'):
+            slowqueries.store(self.item(sql, ('0123456789abcdef',)))
+
+        capture = SlowQuery.objects.get()
+        self.assertEqual(capture.fingerprint, slowqueries.fingerprint(sql)[1])
+        self.assertEqual(capture.view_name, 'assets:purchases')
+        self.assertEqual(capture.duration_ms, 250.0)
+        self.assertIn('slow_queries', capture.plan)
+
+    def test_writes_are_stored_without_a_plan(self):
+        with self.assertLogs('slow_queries', 'WARNING'):
+            slowqueries.store(self.item('UPDATE slow_queries SET plan = %s', ('',)))
+        self.assertEqual(SlowQuery.objects.get().plan, '')
+
+
+
+class ProfilerTests(TestCase):
+    """Superusers' requests asking for a profile are stored as RequestProfile rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser('profiler', 'profiler@example.com', 'pass')
+        cls.officer = User.objects.create_user('officer', 'officer@example.com', 'pass')
+
+    def test_query_parameter_profiles_the_request(self):
+        self.client.force_login(self.superuser)
+
+        response = self.client.get(reverse('dashboard'), {'_profile': '1'})
+
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual((profile.user, profile.method, profile.view_name), (self.superuser, 'GET', 'dashboard'))
+        self.assertEqual((profile.status_code, profile.profiler), (200, 'cprofile'))
+        self.assertEqual(profile.path, f"{reverse('dashboard')}?_profile=1")
+        self.assertGreater(profile.query_count, 0)
+        self.assertEqual(profile.query_count, len(profile.sql_trace))
+        self.assertEqual(set(profile.sql_trace[0]), {'alias', 'sql', 'params', 'ms'})
+        self.assertIn('cumulative', profile.summary)
+        self.assertTrue(marshal.loads(bytes(profile.data)))
+        self.assertTrue(any(timing['template'] == 'assets/dashboard.html' for timing in profile.template_timings))
+
+    def test_header_profiles_the_request(self):
+        self.client.force_login(self.superuser)
+
+        response = self.client.get(reverse('dashboard'), HTTP_X_PROFILE='1')
+
+        self.assertEqual(response['X-Profile-Id'], str(RequestProfile.objects.get().pk))
+
+    def test_sampling_profiler_is_used_when_installed(self):
+        profiler = mock.Mock()
+        profiler.output_text.return_value = 'sampled'
+        profiler.output_html.return_value = '<html></html>'
+        self.client.force_login(self.superuser)
+
+        with mock.patch('tracking.profiling.sampling_profiler', return_value=mock.Mock(return_value=profiler)):
+            self.client.get(reverse('dashboard'), {'_profile': '1'})
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(
+            (profile.profiler, profile.summary, bytes(profile.data)), ('pyinstrument', 'sampled', b'<html></html>')
+        )
+        profiler.start.assert_called_once_with()
+        profiler.stop.assert_called_once_with()
+
+    def test_other_users_are_not_profiled(self):
+        self.client.force_login(self.officer)
+
+        response = self.client.get(reverse('dashboard'), {'_profile': '1'}, HTTP_X_PROFILE='1')
+
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_requests_without_the_parameter_are_not_profiled(self):
+        self.client.force_login(self.superuser)
+
+        response = self.client.get(reverse('dashboard'), {'profile': '1', 'q': '_profile'})
+
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_profiling_can_be_switched_off(self):
+        self.client.force_login(self.superuser)
+
+        response = self.client.get(reverse('dashboard'), {'_profile': '1'})
+
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'military_config.cache.FragmentCache', 'LOCATION': 'fragment-tests'}})
+class FragmentCacheTests(SimpleTestCase):
+    """Template fragment lookups are counted as hits and misses of the 'fragments' cache"""
+
+    def lookups(self, result):
+        return metrics.REGISTRY.get_sample_value(
+            'mams_cache_requests_total', {'cache': 'fragments', 'result': result}
+        ) or 0
+
+    def test_fragment_lookups_are_counted(self):
+        caches['default'].clear()
+        template = engines['django'].from_string('{% load cache %}{% cache 60 counted %}{{ value }}{% endcache %}')
+        hits, misses = self.lookups('hit'), self.lookups('miss')
+
+        self.assertEqual(template.render({'value': 'first'}), 'first')
+        self.assertEqual(template.render({'value': 'second'}), 'first')
+
+        self.assertEqual((self.lookups('hit') - hits, self.lookups('miss') - misses), (1, 1))
+
+    def test_cached_none_and_defaults(self):
+        cache = caches['default']
+        cache.set('empty', None)
+
+        self.assertIsNone(cache.get('empty', 'default'))
+        self.assertEqual(cache.get('absent', 'default'), 'default')
+
+
+# Records metrics the way a gunicorn worker does, in its own process
+WORKER_SCRIPT = """
+from tracking.metrics import record_cache_lookup, record_ledger_write
+record_cache_lookup('fragments', True)
+record_cache_lookup('fragments', {hit})
+record_ledger_write('PURCHASE', 3)
+"""
+
+
+class MetricsEndpointTests(TestCase):
+    """The /metrics scrape endpoint"""
+
+    def scrape(self, **extra):
+        response = self.client.get(reverse('metrics'), **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return {
+            family.name: {tuple(sorted(sample.labels.items())): sample.value for sample in family.samples}
+            for family in text_string_to_metric_families(response.content.decode())
+        }
+
+    def test_addresses_outside_the_allow_list_are_refused(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3')
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.1.2.3'])
+    def test_allow_list_is_configurable(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.scrape(REMOTE_ADDR='10.1.2.3')
+
+    def test_exposed_families(self):
+        metrics.record_cache_lookup('metrics-test', True)
+        metrics.record_cache_lookup('metrics-test', True)
+        metrics.record_cache_lookup('metrics-test', False)
+        self.client.get(reverse('metrics'))  # counted by the middleware once served
+
+        families = self.scrape()
+
+        for name in (
+            'mams_http_requests', 'mams_http_request_duration_seconds', 'mams_db_queries',
+            'mams_db_queries_per_request', 'mams_ledger_writes', 'mams_cache_requests',
+            'mams_pending_purchases', 'mams_transfers_in_transit', 'mams_cache_hit_ratio',
+        ):
+            with self.subTest(family=name):
+                self.assertIn(name, families)
+        cache_requests = families['mams_cache_requests']
+        self.assertEqual(cache_requests[(('cache', 'metrics-test'), ('result', 'hit'))], 2)
+        self.assertEqual(cache_requests[(('cache', 'metrics-test'), ('result', 'miss'))], 1)
+        self.assertAlmostEqual(families['mams_cache_hit_ratio'][(('cache', 'metrics-test'),)], 2 / 3)
+        self.assertIn((('method', 'GET'), ('status', '200'), ('view', 'metrics')), families['mams_http_requests'])
+        self.assertEqual(families['mams_pending_purchases'][()], 0)
+
+    def test_workers_are_aggregated_in_multiprocess_mode(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for hit in (True, False):
+            subprocess.run(
+                [sys.executable, '-c', WORKER_SCRIPT.format(hit=hit)], cwd=settings.BASE_DIR, check=True,
+                env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}, timeout=60,
+            )
+
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+            families = self.scrape()
+
+        cache_requests = families['mams_cache_requests']
+        self.assertEqual(cache_requests, {
+            (('cache', 'fragments'), ('result', 'hit')): 3,
+            (('cache', 'fragments'), ('result', 'miss')): 1,
+        })
+        self.assertEqual(families['mams_ledger_writes'], {(('transaction_type', 'PURCHASE'),): 6})
+        self.assertEqual(families['mams_cache_hit_ratio'], {(('cache', 'fragments'),): 0.75})
@@ -1,3 +1,15 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 
-# Create your views here.
+from military_config.db import query_budget
+from tracking.metrics import render_metrics
+
+
+@query_budget(6)
+def metrics(request):
+    """Prometheus scrape endpoint"""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden('Forbidden')
+
+    payload, content_type = render_metrics()
+    return HttpResponse(payload, content_type=content_type)